@@ -15,6 +15,8 @@ def main(page: ft.Page):
     chat_presenter = ChatPresenter(view=chat_view, page=page)
 
     chat_presenter.set_on_send_handler(chat_view)
+    # Cierra la sesión y las conexiones keep-alive al cerrar la ventana
+    page.on_disconnect = lambda _: page.run_task(chat_presenter.close)
 
     page.add(chat_view)
    
@@ -1,9 +1,12 @@
 from enum import Enum, auto
 from pydantic import BaseModel, Field
-from typing import Protocol, List, Callable
+from typing import Protocol, List, Callable, ContextManager
 import sys
 import os
-import requests
+import json
+import asyncio
+from concurrent.futures import Future
+import httpx
 
 # Add the parent directory to the path so we can import from HService
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
@@ -13,13 +16,24 @@ from HService.domain.dialogue_manager import Message, Response, Intent
 
 import flet as ft
 
+API_URL = os.getenv("HSERVICE_API_URL", "http://localhost:8000")
+API_CONNECT_TIMEOUT = float(os.getenv("HSERVICE_CONNECT_TIMEOUT", "5"))
+# Entre eventos del stream; cubre lo que tarda el modelo en empezar a responder
+API_READ_TIMEOUT = float(os.getenv("HSERVICE_READ_TIMEOUT", "60"))
+API_CONNECT_RETRIES = int(os.getenv("HSERVICE_CONNECT_RETRIES", "2"))
+API_MAX_RECONNECTS = int(os.getenv("HSERVICE_MAX_RECONNECTS", "1"))
+API_RECONNECT_BACKOFF = float(os.getenv("HSERVICE_RECONNECT_BACKOFF", "0.5"))
+
 class ViewProtocol(Protocol):
     def get_user_message(self) -> str: ...
     def display_bot_message(self, message: str) -> None: ...
     def display_user_message(self, message: str) -> None: ...
+    def start_bot_message(self): ...
     def clear_user_input(self) -> None: ...
     def show_loading_indicator(self) -> None: ...
     def hide_loading_indicator(self) -> None: ...
+    def set_send_enabled(self, enabled: bool) -> None: ...
+    def batch(self) -> ContextManager[None]: ...
 
 class BotResponse(BaseModel):
     msg: str
@@ -33,66 +47,165 @@ class ChatPresenter:
         self.model = ChatModel()
         self.view = view
         self.page = page
-        self.api_url = "http://localhost:8000"
+        self.api_url = API_URL
         self.conversation_history = []
         self.bot_msg = ""
         self.is_ticket_closed = False
+        self.session_id = None
+        # Future que devuelve page.run_task para el turno en curso, guardado antes de que arranque,
+        # y la task del turno una vez que arrancó
+        self.pending_task: Future | None = None
+        self.turn_task: asyncio.Task | None = None
+        # Número del último turno enviado; cancel_pending lo incrementa para invalidar uno que no arrancó
+        self.turn = 0
+        self.reply_pending = False
+        # Un solo cliente por ventana: reutiliza las conexiones keep-alive entre turnos
+        self.client = httpx.AsyncClient(
+            base_url=self.api_url,
+            timeout=httpx.Timeout(API_READ_TIMEOUT, connect=API_CONNECT_TIMEOUT),
+            transport=httpx.AsyncHTTPTransport(
+                retries=API_CONNECT_RETRIES,
+                limits=httpx.Limits(max_connections=4, max_keepalive_connections=2, keepalive_expiry=60),
+            ),
+        )
 
-    def clear_chat_history(self):
+    async def clear_chat_history(self):
+        await self.cancel_pending()
+        await self.close_session()
         self.model.conversation_history.clear()
         self.conversation_history = []
         self.bot_msg = ""
         self.is_ticket_closed = False
 
-    def process_user_message(self, message):
-        # Display user message
-        self.view.display_user_message(message)
+    async def create_session(self, history):
+        # El servidor guarda el historial; solo lo mandamos completo al crear la sesión
+        response = await self.client.post(
+            "/sessions",
+            json={"chat_history": [{"sender": msg["role"], "msg": msg["content"]} for msg in history]}
+        )
+        response.raise_for_status()
+        self.session_id = response.json()["session_id"]
+
+    async def close_session(self):
+        if self.session_id is None:
+            return
+        session_id, self.session_id = self.session_id, None
+        try:
+            await self.client.delete(f"/sessions/{session_id}")
+        except httpx.HTTPError:
+            pass
+
+    async def close(self):
+        await self.cancel_pending()
+        await self.close_session()
+        await self.client.aclose()
+
+    async def cancel_pending(self):
+        future, self.pending_task = self.pending_task, None
+        self.turn += 1
+        if future is None or future.done():
+            return
+        # Si el turno todavía no arrancó, ya no arranca; si arrancó, se espera a que termine de cancelarse
+        future.cancel()
+        task = self.turn_task
+        if task is not None and not task.done():
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        self.reply_pending = False
+        self.view.set_send_enabled(True)
+
+    async def stream_from_session(self, message):
+        # Recrea la sesión si expiró en el servidor y reconecta si se corta antes del primer evento
+        for attempt in range(API_MAX_RECONNECTS + 1):
+            if self.session_id is None:
+                await self.create_session(self.conversation_history[:-1])
+            received = False
+            try:
+                async with self.client.stream(
+                    "POST", f"/sessions/{self.session_id}/messages/stream", json={"msg": message}
+                ) as response:
+                    if response.status_code == 404 and attempt < API_MAX_RECONNECTS:
+                        self.session_id = None
+                        continue
+                    if response.status_code != 200:
+                        await response.aread()
+                        yield "error", {"status_code": response.status_code, "detail": response.text}
+                        return
+                    async for event in self.iter_sse_events(response):
+                        received = True
+                        yield event
+                    return
+            except httpx.TransportError:
+                if received or attempt == API_MAX_RECONNECTS:
+                    raise
+                await asyncio.sleep(API_RECONNECT_BACKOFF * (2 ** attempt))
+
+    async def iter_sse_events(self, response):
+        event, data = None, []
+        async for line in response.aiter_lines():
+            if line.startswith("event:"):
+                event = line[len("event:"):].strip()
+            elif line.startswith("data:"):
+                data.append(line[len("data:"):].strip())
+            elif not line and event is not None:
+                yield event, json.loads("\n".join(data))
+                event, data = None, []
 
-        # Show loading indicator
-        self.view.show_loading_indicator()
+    async def process_user_message(self, message):
+        # Display user message, show loading indicator and clear user input in a single update
+        with self.view.batch():
+            self.view.display_user_message(message)
+            self.view.show_loading_indicator()
+            self.view.clear_user_input()
 
         # Add user message to conversation history
         self.model.conversation_history.append({"role": "user", "content": message})
         self.conversation_history.append({"role": "user", "content": message})
 
-        # Generate bot response using HService API
+        # Generate bot response using HService API, rendering it while it streams in
+        bubble = None
+        self.bot_msg = "Error connecting to API: the response stream ended unexpectedly"
+        self.is_ticket_closed = False
         try:
-            # Call the API
-            response = requests.post(
-                f"{self.api_url}/chat",
-                json={"chat_history": [{"sender": msg["role"], "msg": msg["content"]} for msg in self.conversation_history]}
-            )
-            
-            if response.status_code == 200:
-                result = response.json()
-                self.bot_msg = result["response"]
-                self.is_ticket_closed = result["is_ticket_closed"]
-            else:
-                error_msg = f"API error: {response.status_code} - {response.text}"
-                self.bot_msg = error_msg
-                self.is_ticket_closed = False
+            async for event, data in self.stream_from_session(message):
+                if event == "delta":
+                    if bubble is None:
+                        with self.view.batch():
+                            self.view.hide_loading_indicator()
+                            bubble = self.view.start_bot_message()
+                    bubble.append_text(data["text"])
+                elif event == "done":
+                    self.bot_msg = data["response"]
+                    self.is_ticket_closed = data["is_ticket_closed"]
+                elif event == "error":
+                    self.bot_msg = f"API error: {data['status_code']} - {data['detail']}"
+                    self.is_ticket_closed = False
+        except asyncio.CancelledError:
+            # Se abrió un ticket nuevo o se cerró la ventana: la respuesta pendiente se descarta
+            raise
+        except httpx.TimeoutException:
+            self.bot_msg = "Error connecting to API: the request timed out"
         except Exception as e:
             error_msg = f"Error connecting to API: {str(e)}"
             self.bot_msg = error_msg
             self.is_ticket_closed = False
 
-        # Hide loading indicator
-        self.view.hide_loading_indicator()
+        # Display bot response (the final text wins over the streamed one if they differ)
+        with self.view.batch():
+            if bubble is None:
+                self.view.hide_loading_indicator()
+                self.view.display_bot_message(self.bot_msg)
+            elif bubble.text.value != self.bot_msg:
+                bubble.set_text(self.bot_msg)
 
-        # Display bot response
-        self.view.display_bot_message(self.bot_msg)
+            # If the ticket is closed, you might want to handle it here
+            if self.is_ticket_closed:
+                self.view.display_bot_message("The support ticket has been closed. Thank you for using our service!")
 
         # Add bot response to conversation history
         self.model.conversation_history.append({"role": "assistant", "content": self.bot_msg})
         self.conversation_history.append({"role": "assistant", "content": self.bot_msg})
 
-        # Clear user input
-        self.view.clear_user_input()
-
-        # If the ticket is closed, you might want to handle it here
-        if self.is_ticket_closed:
-            self.view.display_bot_message("The support ticket has been closed. Thank you for using our service!")
-
     def get_chat_history(self):
         return self.conversation_history
 
@@ -102,14 +215,43 @@ class ChatPresenter:
             print(f"{message['role']}: {message['content']}")
 
     def handle_send(self, message):
-        self.process_user_message(message)
+        # Un turno a la vez: el envío queda deshabilitado hasta que termina la respuesta,
+        # y lo que el usuario escriba mientras tanto queda en el campo de texto
+        if self.reply_pending:
+            return
+        self.reply_pending = True
+        self.view.set_send_enabled(False)
+        # Se guarda antes de que el turno arranque: cancel_pending lo ve aunque se termine la
+        # conversación enseguida después de enviar
+        self.turn += 1
+        self.pending_task = self.page.run_task(self._start_turn, message, self.turn)
+
+    async def _start_turn(self, message, turn):
+        if turn != self.turn:
+            # Se canceló antes de arrancar (p. ej. se terminó la conversación apenas enviado)
+            return
+        self.turn_task = asyncio.current_task()
+        try:
+            await self.process_user_message(message)
+        finally:
+            self.turn_task = None
+            self.reply_pending = False
+            self.view.set_send_enabled(True)
+
+    def handle_end_conversation(self):
+        self.page.run_task(self.clear_chat_history)
+
+    def handle_new_ticket(self):
+        self.page.run_task(self.new_ticket)
 
     def set_on_send_handler(self, chat_view):
         chat_view.on_send = self.handle_send
+        chat_view.on_end_conversation = self.handle_end_conversation
+        chat_view.on_new_ticket = self.handle_new_ticket
 
-    def new_ticket(self):
-        # Clear the chat history
-        self.clear_chat_history()
+    async def new_ticket(self):
+        # Clear the chat history (cancels a reply that is still pending)
+        await self.clear_chat_history()
 
         # Display a message indicating a new chat has started
         new_chat_message = "A new support ticket has been opened. How can I assist you today?"
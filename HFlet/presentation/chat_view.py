@@ -1,6 +1,19 @@
 import flet as ft
+import os
+from contextlib import contextmanager
+from dataclasses import dataclass
 from typing import Callable
 
+CHAT_MAX_LIVE_MESSAGES = int(os.getenv("CHAT_MAX_LIVE_MESSAGES", "200"))
+CHAT_HISTORY_PAGE_SIZE = int(os.getenv("CHAT_HISTORY_PAGE_SIZE", "50"))
+
+
+@dataclass
+class ChatMessage:
+    text: str
+    is_user: bool
+
+
 class InputRow(ft.Row):
     def __init__(self, on_submit, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -30,7 +43,7 @@ class MessageBubble(ft.Container):
         self.border_radius = ft.border_radius.all(10)
         self.bgcolor = "#F0636C" if is_user else "#4A5459"  # Coral-red for user, dark blue-gray for bot
         
-        text = ft.Text(
+        self.text = ft.Text(
             message,
             size=14,
             overflow=ft.TextOverflow.VISIBLE,
@@ -40,7 +53,7 @@ class MessageBubble(ft.Container):
         )
         
         text_container = ft.Container(
-            content=text,
+            content=self.text,
             padding=ft.padding.all(4),
             alignment=ft.alignment.center_left,
         )
@@ -53,13 +66,36 @@ class MessageBubble(ft.Container):
             self.margin = ft.margin.only(left=80, right=10, top=5, bottom=5)
         else:
             self.margin = ft.margin.only(left=10, right=80, top=5, bottom=5)
-            
+
+    def is_isolated(self):
+        # La lista no recorre el interior de las burbujas al actualizarse; el texto se actualiza solo
+        return True
+
+    def append_text(self, text: str):
+        self.text.value += text
+        self.text.update()
+
+    def set_text(self, text: str):
+        self.text.value = text
+        self.text.update()
+
 class ChatView(ft.Container):  # Changed from ft.View to ft.Container
-    def __init__(self, on_send: Callable[[str], None], expand: bool = False):
+    def __init__(self, on_send: Callable[[str], None], expand: bool = False, max_live_messages: int = CHAT_MAX_LIVE_MESSAGES):
         super().__init__()
         self.on_send = on_send
+        self.on_end_conversation: Callable[[], None] = lambda: None
+        self.on_new_ticket: Callable[[], None] = lambda: None
         self.expand = expand
-        self.chat_messages = ft.Column(scroll="auto", expand=True)
+        self.max_live_messages = max_live_messages
+        # Historial completo; solo los últimos mensajes tienen burbuja en pantalla
+        self.messages: list[ChatMessage] = []
+        self.first_live = 0
+        self._batch_depth = 0
+        self._dirty: list[ft.Control] = []
+        # ListView solo construye las burbujas visibles
+        self.chat_messages = ft.ListView(expand=True, auto_scroll=True)
+        self.earlier_button = ft.TextButton(on_click=self.show_earlier_messages, visible=False)
+        self.loading_indicator = ft.ProgressRing(width=24, height=24, visible=False)
         self.user_input = ft.TextField(
             hint_text="Type your message here...",
             expand=True,
@@ -81,7 +117,9 @@ class ChatView(ft.Container):  # Changed from ft.View to ft.Container
         
         # Set the content directly in the constructor
         self.content = ft.Column([
+            self.earlier_button,
             self.chat_messages,
+            self.loading_indicator,
             ft.Row([
                 self.user_input,
                 self.send_button
@@ -93,34 +131,105 @@ class ChatView(ft.Container):  # Changed from ft.View to ft.Container
         self.expand = expand
         self.padding = ft.padding.all(10)
 
+    @contextmanager
+    def batch(self):
+        # Agrupa los cambios de un turno en un solo update()
+        self._batch_depth += 1
+        try:
+            yield
+        finally:
+            self._batch_depth -= 1
+            if self._batch_depth == 0 and self._dirty:
+                dirty, self._dirty = self._dirty, []
+                self.page.update(*dirty)
+
+    def _changed(self, control: ft.Control):
+        # Solo se envía el control que cambió, no todo el ChatView
+        if not self._batch_depth:
+            control.update()
+        elif control not in self._dirty:
+            self._dirty.append(control)
+
+    def _add_message(self, message: str, is_user: bool) -> MessageBubble:
+        record = ChatMessage(message, is_user)
+        bubble = MessageBubble(message, is_user=is_user)
+        bubble.message = record
+        self.messages.append(record)
+        self.chat_messages.controls.append(bubble)
+
+        # Descarta las burbujas más viejas; el texto queda en self.messages
+        excess = len(self.chat_messages.controls) - self.max_live_messages
+        if excess > 0:
+            for old in self.chat_messages.controls[:excess]:
+                old.message.text = old.text.value
+            del self.chat_messages.controls[:excess]
+            self.first_live += excess
+        self._update_earlier_button()
+        self._changed(self.chat_messages)
+        return bubble
+
+    def _update_earlier_button(self):
+        visible = self.first_live > 0
+        if visible or self.earlier_button.visible:
+            self.earlier_button.visible = visible
+            self.earlier_button.text = f"Show earlier messages ({self.first_live})"
+            if self.earlier_button.page is not None:
+                self._changed(self.earlier_button)
+
+    def show_earlier_messages(self, _=None):
+        start = max(0, self.first_live - CHAT_HISTORY_PAGE_SIZE)
+        bubbles = []
+        for record in self.messages[start:self.first_live]:
+            bubble = MessageBubble(record.text, is_user=record.is_user)
+            bubble.message = record
+            bubbles.append(bubble)
+        self.chat_messages.controls[:0] = bubbles
+        self.first_live = start
+        self._update_earlier_button()
+        self._changed(self.chat_messages)
+
+    def get_messages(self) -> list[ChatMessage]:
+        # Sincroniza el texto de las burbujas vivas (las de streaming cambian después de creadas)
+        for bubble in self.chat_messages.controls:
+            if isinstance(bubble, MessageBubble):
+                bubble.message.text = bubble.text.value
+        return self.messages
+
     def send_message(self, _):
         message = self.user_input.value
-        if message:
+        if message and not self.send_button.disabled:
             self.on_send(message)
 
     def get_user_message(self) -> str:
         return self.user_input.value
 
     def display_bot_message(self, message: str):
-        self.chat_messages.controls.append(MessageBubble(message, is_user=False))
-        self.chat_messages.update()
+        self._add_message(message, is_user=False)
+
+    def start_bot_message(self) -> MessageBubble:
+        # Burbuja vacía que se va completando mientras llega la respuesta en streaming
+        return self._add_message("", is_user=False)
 
     def display_user_message(self, message: str):
-        self.chat_messages.controls.append(MessageBubble(message, is_user=True))
-        self.chat_messages.update()
+        self._add_message(message, is_user=True)
 
     def clear_user_input(self):
         self.user_input.value = ""
-        self.user_input.update()
+        self._changed(self.user_input)
 
     def show_loading_indicator(self):
-        self.chat_messages.controls.append(ft.ProgressRing())
-        self.chat_messages.update()
+        self.loading_indicator.visible = True
+        self._changed(self.loading_indicator)
 
     def hide_loading_indicator(self):
-        if isinstance(self.chat_messages.controls[-1], ft.ProgressRing):
-            self.chat_messages.controls.pop()
-            self.chat_messages.update()
+        if self.loading_indicator.visible:
+            self.loading_indicator.visible = False
+            self._changed(self.loading_indicator)
+
+    def set_send_enabled(self, enabled: bool):
+        # Enter en el campo de texto también respeta el botón deshabilitado (ver send_message)
+        self.send_button.disabled = not enabled
+        self._changed(self.send_button)
 
     def show_ticket_closed_popup(self, _):
         def close_dlg(_):
@@ -142,9 +251,14 @@ class ChatView(ft.Container):  # Changed from ft.View to ft.Container
     def end_conversation(self):
         # Display chat history in console
         self.display_chat_history()
+        self.on_end_conversation()
         
         # Clear all messages
         self.chat_messages.controls.clear()
+        self.messages = []
+        self.first_live = 0
+        self.earlier_button.visible = False
+        self.loading_indicator.visible = False
         
         # Hide input row and end conversation button
         self.user_input.visible = False
@@ -178,11 +292,11 @@ class ChatView(ft.Container):  # Changed from ft.View to ft.Container
         self.new_ticket_button.visible = False
         
         self.update()
+        self.on_new_ticket()
 
     def display_chat_history(self):
         print("Chat History:")
-        for message in self.chat_messages.controls:
-            if isinstance(message, MessageBubble):
-                sender = "User" if message.alignment == ft.alignment.center_right else "Bot"
-                print(f"{sender}: {message.content.content.value}")
+        for message in self.get_messages():
+            sender = "User" if message.is_user else "Bot"
+            print(f"{sender}: {message.text}")
         print("End of Chat History")
@@ -1,9 +1,53 @@
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
-from typing import List
-from HService.domain.dialogue_manager import DialogueManager, Message
+import time
 
-app = FastAPI()
+# Referencia del cold start: desde que se empieza a importar la app hasta que queda lista
+STARTED_AT = time.perf_counter()
+
+import asyncio
+import json
+import logging
+import os
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field
+from typing import List, Optional
+from HService.domain.models import Intent, Message
+from HService.service.admission import CHAT_DEADLINE_SECONDS, AdmissionController, deadline_exceeded, run_turn
+from HService.service.batch_service import (
+    BATCH_CONCURRENCY, BATCH_DEADLINE_SECONDS, BATCH_MAX_CONCURRENCY, BATCH_MAX_IN_FLIGHT, BATCH_MAX_ITEMS, BatchItem, BatchRunner,
+)
+from HService.service.session_service import SessionStore
+from HService.service.observability import configure_logging, log_event, registry, request_duration, stage_times
+from HService.service.startup import ServiceState
+from HService.service.transcript_service import TranscriptRecord, TranscriptWriter
+
+configure_logging(os.getenv("LOG_LEVEL", "INFO"))
+logger = logging.getLogger(__name__)
+
+# Rutas que no se loguean en cada request: scraping y probes
+QUIET_ROUTES = {"/metrics", "/healthz", "/readyz"}
+SESSION_BUSY_DETAIL = "Another message for this session is still being answered."
+
+service = ServiceState(STARTED_AT)
+transcript_writer = TranscriptWriter()
+admission = AdmissionController()
+# Cupo compartido por todos los batches del worker
+batch_slots = asyncio.Semaphore(BATCH_MAX_IN_FLIGHT)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # La inicialización corre en segundo plano: el worker acepta conexiones y /readyz indica cuándo está listo
+    startup = asyncio.create_task(service.start())
+    transcript_writer.start()
+    yield
+    if not startup.done():
+        startup.cancel()
+    # Los transcripts encolados, y los de las sesiones que siguen abiertas, se escriben antes de que termine el worker
+    session_store.close()
+    await transcript_writer.close()
+
+app = FastAPI(lifespan=lifespan)
 
 class MessageModel(BaseModel):
     sender: str
@@ -16,19 +60,300 @@ class BotResponse(BaseModel):
     response: str
     is_ticket_closed: bool
 
-dialogue_manager = DialogueManager()
+class CreateSessionModel(BaseModel):
+    chat_history: List[MessageModel] = []
+
+class SessionResponse(BaseModel):
+    session_id: str
+
+class SessionMessageModel(BaseModel):
+    msg: str
+
+class BatchItemModel(BaseModel):
+    id: str
+    chat_history: List[MessageModel]
+    expected_intent: Optional[Intent] = None
+
+class BatchRequestModel(BaseModel):
+    items: List[BatchItemModel] = Field(max_length=BATCH_MAX_ITEMS)
+    concurrency: int = Field(BATCH_CONCURRENCY, ge=1, le=BATCH_MAX_CONCURRENCY)
+    # False: cada item se responde de nuevo aunque la respuesta esté en la caché
+    response_cache: bool = True
+
+class BatchResultModel(BaseModel):
+    id: str
+    intent: Optional[str]
+    expected_intent: Optional[str]
+    correct: Optional[bool]
+    response: Optional[str]
+    is_ticket_closed: Optional[bool]
+    latency_s: float
+    prompt_tokens: int
+    response_tokens: int
+    cost_usd: float
+    error: Optional[str]
+
+class BatchResponseModel(BaseModel):
+    results: List[BatchResultModel]
+    report: dict
+
+def dialogue_gauge(name: str, help: str, fn):
+    # Hasta que termina el arranque no hay DialogueManager: la métrica vale 0
+    registry.gauge(name, help, lambda: fn(service.dialogue_manager) if service.dialogue_manager is not None else 0)
+
+registry.gauge("hservice_ready", "1 once startup and warm-up finished.", lambda: int(service.ready))
+registry.gauge("hservice_cold_start_seconds", "Seconds from importing the app to ready.", lambda: service.timings.get("cold_start", 0))
+registry.gauge("hservice_sessions", "Live chat sessions.", lambda: len(session_store))
+registry.gauge("hservice_chat_in_flight", "Chat turns being answered by this worker.", lambda: admission.in_flight)
+registry.gauge("hservice_admission_estimated_wait_seconds", "Estimated wait for a new chat turn.", lambda: admission.estimated_wait())
+registry.gauge("hservice_transcript_queue_depth", "Transcripts waiting to be written.", lambda: transcript_writer.depth())
+dialogue_gauge("hservice_response_cache_entries", "Entries in the response cache.", lambda dm: dm.response_cache.stats()["entries"])
+dialogue_gauge("hservice_response_cache_hits", "Response cache hits.", lambda dm: dm.response_cache.hits)
+dialogue_gauge("hservice_response_cache_misses", "Response cache misses.", lambda dm: dm.response_cache.misses)
+dialogue_gauge("hservice_llm_waiters", "Requests waiting on the LLM rate limiters.", lambda dm: sum(p.governor.waiters for llm in dm.tiers().values() for p in llm.providers))
+dialogue_gauge("hservice_llm_circuit_open", "LLM providers whose circuit breaker is not closed.", lambda dm: sum(p.governor.breaker.state != "closed" for llm in dm.tiers().values() for p in llm.providers))
+
+def persist_transcript(messages: List[Message], response):
+    # Chat sin sesión: solo se guarda cuando el LLM cierra el ticket
+    if response.is_ticket_closed:
+        transcript_writer.submit(TranscriptRecord(
+            None, messages + [Message(role="assistant", content=response.bot_msg)],
+            response.intent.value, True, "ticket_closed", time.time(),
+        ))
+
+def persist_session(session, reason: str):
+    # Encolar no espera a la base. Solo los mensajes posteriores al último guardado: si no hay ninguno
+    # del usuario no hay nada que escribir
+    messages = session.history[session.persisted_messages:]
+    if not any(m.role == "user" for m in messages):
+        return
+    transcript_writer.submit(TranscriptRecord(
+        session.session_id, messages, session.intent, session.is_ticket_closed, reason, time.time(),
+    ))
+    session.persisted_messages = len(session.history)
+
+def save_session_turn(session, user_message: Message, response):
+    session_store.append(session, user_message)
+    session_store.append(session, Message(role="assistant", content=response.bot_msg))
+    session.intent = response.intent.value
+    session.is_ticket_closed = response.is_ticket_closed
+    if response.is_ticket_closed:
+        persist_session(session, "ticket_closed")
+
+# Las sesiones abandonadas también se guardan: al expirar, al desalojarse por capacidad o al apagar el worker
+session_store = SessionStore(on_evict=persist_session)
+
+@app.middleware("http")
+async def record_timings(request: Request, call_next):
+    # Cada request junta la duración de sus etapas para el log estructurado y el header Server-Timing
+    times = {}
+    stage_times.set(times)
+    start = time.perf_counter()
+    response = await call_next(request)
+    elapsed = time.perf_counter() - start
+
+    route = request.scope.get("route")
+    path = route.path if route is not None else request.url.path
+    request_duration.observe(elapsed, route=path, method=request.method)
+    response.headers["Server-Timing"] = ", ".join(
+        [f"{stage};dur={seconds * 1000:.2f}" for stage, seconds in times.items()] + [f"total;dur={elapsed * 1000:.2f}"]
+    )
+    if path not in QUIET_ROUTES:
+        log_event(
+            logger, "request",
+            method=request.method, route=path, status=response.status_code,
+            duration_ms=round(elapsed * 1000, 2), stages_ms={k: round(v * 1000, 2) for k, v in times.items()},
+        )
+    return response
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/healthz")
+async def healthz():
+    # Liveness: el proceso responde, aunque todavía esté arrancando
+    return {"status": "ok"}
+
+@app.get("/readyz")
+async def readyz():
+    # Readiness: solo con el DialogueManager creado y el warm-up terminado
+    status = service.status()
+    return JSONResponse(status, status_code=200 if service.ready else 503)
 
 @app.post("/chat", response_model=BotResponse)
-async def chat(chat_history: ChatHistoryModel):
+async def chat(chat_history: ChatHistoryModel, request: Request):
+    dialogue_manager = service.require()
+    with admission.admit():
+        try:
+            # Convert ChatHistoryModel to List[Message]
+            messages = [Message(role=msg.sender, content=msg.msg) for msg in chat_history.chat_history]
+
+            # Get response from DialogueManager, con deadline y cancelado si el cliente se va
+            response = await run_turn(request, dialogue_manager.get_response_async(messages))
+            persist_transcript(messages, response)
+
+            return BotResponse(response=response.bot_msg, is_ticket_closed=response.is_ticket_closed)
+        except HTTPException as he:
+            raise he
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+
+@asynccontextmanager
+async def batch_item_slot():
+    # Un batch nunca ocupa más de BATCH_MAX_IN_FLIGHT turnos y cada item cuenta como turno en curso para admission
+    async with batch_slots:
+        with admission.slot():
+            yield
+
+@app.post("/chat/batch", response_model=BatchResponseModel)
+async def chat_batch(body: BatchRequestModel, request: Request):
+    # Reproduce transcripts completos y compara el intent detectado con el esperado
+    dialogue_manager = service.require()
+    admission.check()
+    items = [
+        BatchItem(
+            id=item.id,
+            chat_history=[Message(role=msg.sender, content=msg.msg) for msg in item.chat_history],
+            expected_intent=item.expected_intent,
+        )
+        for item in body.items
+    ]
+    runner = BatchRunner(
+        dialogue_manager, concurrency=body.concurrency, slot=batch_item_slot,
+        item_deadline=CHAT_DEADLINE_SECONDS, use_response_cache=body.response_cache,
+    )
+    # Si el cliente se desconecta se cancelan los items pendientes
+    results, report = await run_turn(request, runner.run(items), deadline=BATCH_DEADLINE_SECONDS)
+    order = {item.id: i for i, item in enumerate(items)}
+    results.sort(key=lambda r: order[r.id])
+    return BatchResponseModel(
+        results=[
+            BatchResultModel(
+                id=r.id, intent=r.intent, expected_intent=r.expected_intent, correct=r.correct,
+                response=r.bot_msg, is_ticket_closed=r.is_ticket_closed, latency_s=r.latency_s,
+                prompt_tokens=r.prompt_tokens, response_tokens=r.response_tokens, cost_usd=r.cost_usd, error=r.error,
+            )
+            for r in results
+        ],
+        report=report,
+    )
+
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+async def stream_chat_events(dialogue_manager, messages: List[Message], on_done=None, deadline: float = CHAT_DEADLINE_SECONDS):
+    # Eventos SSE: "delta" con cada parte de bot_msg, "done" con la respuesta final o "error".
+    # Si el cliente se desconecta, StreamingResponse cancela este generador y con él la llamada al LLM
+    events = dialogue_manager.stream_response_async(messages)
+    deadline_at = asyncio.get_running_loop().time() + deadline
     try:
-        # Convert ChatHistoryModel to List[Message]
-        messages = [Message(role=msg.sender, content=msg.msg) for msg in chat_history.chat_history]
-        
-        # Get response from DialogueManager
-        response = dialogue_manager.get_response(messages)
-        
-        return BotResponse(response=response.bot_msg, is_ticket_closed=response.is_ticket_closed)
+        with admission.slot():
+            while True:
+                # El deadline cubre cada espera del generador, nunca un yield: así no cancela al que envía los eventos
+                try:
+                    async with asyncio.timeout_at(deadline_at):
+                        kind, payload = await anext(events)
+                except StopAsyncIteration:
+                    break
+                if kind == "delta":
+                    yield sse_event("delta", {"text": payload})
+                else:
+                    if on_done is not None:
+                        on_done(payload)
+                    yield sse_event("done", {
+                        "response": payload.bot_msg,
+                        "intent": payload.intent.value,
+                        "is_ticket_closed": payload.is_ticket_closed,
+                    })
+    except TimeoutError:
+        deadline_exceeded.inc(route="stream")
+        yield sse_event("error", {"status_code": 504, "detail": "The assistant took too long to answer. Please try again."})
     except HTTPException as he:
-        raise he
+        yield sse_event("error", {"status_code": he.status_code, "detail": he.detail})
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        yield sse_event("error", {"status_code": 500, "detail": str(e)})
+    finally:
+        # Si el cliente se fue entre eventos, cerramos acá la llamada al LLM en vez de dejarla al recolector
+        await events.aclose()
+
+@app.post("/chat/stream")
+async def chat_stream(chat_history: ChatHistoryModel):
+    dialogue_manager = service.require()
+    # El lugar se ocupa recién cuando empieza el stream, dentro de stream_chat_events
+    admission.check()
+    messages = [Message(role=msg.sender, content=msg.msg) for msg in chat_history.chat_history]
+
+    def on_done(response):
+        persist_transcript(messages, response)
+
+    return StreamingResponse(stream_chat_events(dialogue_manager, messages, on_done=on_done), media_type="text/event-stream")
+
+@app.post("/sessions", response_model=SessionResponse)
+async def create_session(body: CreateSessionModel):
+    # El historial inicial es opcional: permite retomar una conversación cuya sesión expiró
+    messages = [Message(role=msg.sender, content=msg.msg) for msg in body.chat_history]
+    session = session_store.create(messages)
+    return SessionResponse(session_id=session.session_id)
+
+@app.post("/sessions/{session_id}/messages", response_model=BotResponse)
+async def session_chat(session_id: str, body: SessionMessageModel, request: Request):
+    dialogue_manager = service.require()
+    session = session_store.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found or expired")
+
+    async def turn():
+        async with session.lock:
+            # Solo llega el mensaje nuevo; el historial completo vive en el servidor
+            messages = session.history + [Message(role="user", content=body.msg)]
+            response = await dialogue_manager.get_response_async(messages)
+            # El turno se guarda solo si hubo respuesta, así un error o una cancelación no dejan el historial a medias
+            save_session_turn(session, messages[-1], response)
+            return response
+
+    with admission.admit():
+        try:
+            # La espera del lock de la sesión también entra en el deadline
+            response = await run_turn(request, turn())
+        except HTTPException as he:
+            raise he
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+
+    return BotResponse(response=response.bot_msg, is_ticket_closed=response.is_ticket_closed)
+
+@app.delete("/sessions/{session_id}", status_code=204)
+async def delete_session(session_id: str):
+    # El cliente terminó la conversación: el transcript se guarda en segundo plano
+    session = session_store.delete(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found or expired")
+    persist_session(session, "session_ended")
+
+@app.post("/sessions/{session_id}/messages/stream")
+async def session_chat_stream(session_id: str, body: SessionMessageModel):
+    dialogue_manager = service.require()
+    session = session_store.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found or expired")
+    # Un stream no espera el lock de la sesión: esa espera no tendría deadline ni contaría para admission
+    if session.lock.locked():
+        raise HTTPException(status_code=409, detail=SESSION_BUSY_DETAIL)
+    admission.check()
+
+    async def events():
+        # Otro turno pudo tomar la sesión antes de que empiece el stream
+        if session.lock.locked():
+            yield sse_event("error", {"status_code": 409, "detail": SESSION_BUSY_DETAIL})
+            return
+        async with session.lock:
+            messages = session.history + [Message(role="user", content=body.msg)]
+
+            def save_turn(response):
+                save_session_turn(session, messages[-1], response)
+
+            async for event in stream_chat_events(dialogue_manager, messages, on_done=save_turn):
+                yield event
+
+    return StreamingResponse(events(), media_type="text/event-stream")
@@ -1,68 +1,46 @@
-import warnings
-warnings.filterwarnings("ignore", category=DeprecationWarning, module="google._upb._message")
-
-import os
-import json
-import re
+import asyncio
+import logging
 import time
+from contextlib import contextmanager
 from typing import List
-from dotenv import load_dotenv
-import google.generativeai as genai
-from fastapi import HTTPException
-from pydantic import ValidationError
-
-from HService.domain.models import Intent, Message, Response, Product
-from HService.service.product_service import get_all_products
-
-
-# ---------------- Gemini Wrapper ----------------
-class GeminiWrapper:
-    def __init__(self):
-        load_dotenv()
-        api_key = os.getenv("GOOGLE_API_KEY")
-        if not api_key:
-            raise ValueError("GOOGLE_API_KEY not found in environment variables")
-
-        genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel("gemini-1.5-pro")
-        self.last_request_time = 0
-        self.request_interval = 0
-
-    def extract_first_json_block(self, text: str) -> str:
-        match = re.search(r'{.*}', text, re.DOTALL)
-        if match:
-            return match.group(0)
-        else:
-            raise ValueError("No valid JSON block found.")
-
-    def send(self, prompt: str, response_model):
-        try:
-            response = self.model.generate_content(prompt)
-            content = response.text.strip()
-            print("Raw Gemini response:\n", content)  # Debug print
 
-            try:
-                json_str = self.extract_first_json_block(content)
-                data = json.loads(json_str)
+from HService.domain.models import Intent, Message, Response
+from HService.domain.history import HistoryCompactor
+from HService.domain.fast_path import FastPathResponder
+from HService.domain.llm_providers import InvalidResponseError
+from HService.domain.llm_router import LLMRouter, create_fast_llm, create_llm
+from HService.domain.tier_policy import TierPolicy
+from HService.service.product_service import get_catalog, get_catalog_async, select_product_info
+from HService.service.response_cache import ResponseCache
+from HService.service.observability import estimate_cost, registry, span, track_llm_usage
 
-                if "intent" in data and data["intent"] not in [e.value for e in Intent]:
-                    raise HTTPException(status_code=500, detail=f"Invalid intent value: {data['intent']}")
+logger = logging.getLogger(__name__)
 
-                return response_model(**data)
-            except (json.JSONDecodeError, ValidationError, ValueError) as e:
-                print(f"Error parsing response: {e}")
-                raise HTTPException(status_code=500, detail="Invalid response format from Gemini.")
+turns_by_path = registry.counter("hservice_chat_turns_total", "Chat turns by the path that answered them.")
+tier_turns = registry.counter("hservice_llm_tier_turns_total", "LLM turns by model tier and routing reason.")
+tier_escalations = registry.counter("hservice_llm_tier_escalations_total", "Fast-tier turns retried on the pro tier.")
+tier_latency = registry.histogram("hservice_llm_tier_latency_seconds", "LLM latency per turn, by model tier.")
+tier_cost = registry.counter("hservice_llm_tier_cost_usd_total", "Estimated LLM cost in USD, by model tier.")
 
-        except Exception as e:
-            print(f"Error while contacting Gemini: {str(e)}")
-            if "rate limit" in str(e).lower():
-                raise HTTPException(status_code=429, detail="Too many requests. Please try again later.")
-            raise HTTPException(status_code=500, detail="An error occurred while processing your request.")
 
 # ---------------- Dialogue Manager ----------------
 class DialogueManager:
-    def __init__(self):
-        self.gemini = GeminiWrapper()
+    def __init__(self, llm: LLMRouter | None = None, fast_llm: LLMRouter | None = None, tier_policy: TierPolicy | None = None):
+        # Depende solo de la interfaz de proveedor: send, send_async, stream_response_async y model_name.
+        # llm es el tier pro; fast_llm, opcional, atiende los turnos simples. Sin llm se configuran ambos por entorno
+        self.tier_policy = tier_policy or TierPolicy()
+        self.history_compactor = HistoryCompactor()
+        self.response_cache = ResponseCache()
+        self.fast_path = FastPathResponder.from_env()
+        if llm is None:
+            llm = create_llm()
+            # El tier rápido es opt-in (LLM_FAST_PROVIDERS) y sin clasificador local TierPolicy nunca lo elegiría:
+            # en ese caso no se crea ni se calienta
+            if fast_llm is None and self.fast_path.classifier is not None:
+                fast_llm = create_fast_llm()
+        self.llm = llm
+        # Sin tier rápido, fast_llm es el mismo router que llm
+        self.fast_llm = fast_llm or llm
         self.system_message = (
             "You are an expert AI customer service assistant trained to resolve all user requests without human intervention. "
             "You are autonomous and confident in your answers, and never refer the user to a human agent. "
@@ -72,19 +50,179 @@ class DialogueManager:
             "Your job is to fully handle the situation until the ticket can be closed."
         )
 
-    def get_response(self, chat_history: List[Message]) -> Response:
-        formatted_history = self._format_chat_history(chat_history)
+    async def warm_up_async(self, llm: bool = True) -> tuple[dict[str, float], dict[str, str]]:
+        # Lo que de otro modo pagaría el primer usuario: catálogo e índice, clasificador local y conexión al LLM.
+        # Devuelve la duración de cada paso y los errores; un error no impide atender, el paso se reintenta en el primer turno
+        timings, errors = {}, {}
+        steps = {
+            "catalog": get_catalog_async,
+            "fast_path": lambda: asyncio.to_thread(self.fast_path.classify, [Message(role="user", content="hola")]),
+        }
+        for name, step in steps.items():
+            start = time.perf_counter()
+            try:
+                await step()
+            except Exception as e:
+                errors[name] = f"{type(e).__name__}: {e}"
+            timings[name] = time.perf_counter() - start
+
+        if llm:
+            for tier, router in self.tiers().items():
+                start = time.perf_counter()
+                failed = await router.warm_up_async()
+                errors.update({f"llm:{provider}": error for provider, error in failed.items()})
+                timings[f"llm_{tier}"] = time.perf_counter() - start
+        return timings, errors
+
+    def tiers(self) -> dict[str, LLMRouter]:
+        tiers = {"pro": self.llm}
+        if self.fast_llm is not self.llm:
+            tiers["fast"] = self.fast_llm
+        return tiers
+
+    def _choose_tier(self, chat_history: List[Message], prediction) -> tuple[str, str]:
+        if self.fast_llm is self.llm:
+            return "pro", "single_tier"
+        return self.tier_policy.choose(chat_history, prediction)
+
+    @contextmanager
+    def _tier_call(self, tier: str, reason: str):
+        # Latencia y costo de cada tier; los tokens se siguen sumando al request (p. ej. al item de un batch)
+        tier_turns.inc(tier=tier, reason=reason)
+        start = time.perf_counter()
+        with track_llm_usage() as usage:
+            try:
+                yield
+            finally:
+                tier_latency.observe(time.perf_counter() - start, tier=tier)
+                tier_cost.inc(sum(estimate_cost(model, p, r) for model, (p, r) in usage.items()), tier=tier)
+
+    def _ask_llm(self, chat_history: List[Message], prompt: str, prediction) -> Response:
+        tier, reason = self._choose_tier(chat_history, prediction)
+        if tier == "fast":
+            try:
+                # Sin reparación en el tier rápido: si la respuesta no valida, la rehace el modelo pro
+                with self._tier_call("fast", reason):
+                    return self.fast_llm.send(prompt, response_model=Response, repair=False)
+            except InvalidResponseError:
+                tier_escalations.inc(reason="invalid_response")
+                reason = "escalated"
+        with self._tier_call("pro", reason):
+            return self.llm.send(prompt, response_model=Response)
+
+    async def _ask_llm_async(self, chat_history: List[Message], prompt: str, prediction) -> Response:
+        tier, reason = self._choose_tier(chat_history, prediction)
+        if tier == "fast":
+            try:
+                with self._tier_call("fast", reason):
+                    return await self.fast_llm.send_async(prompt, response_model=Response, repair=False)
+            except InvalidResponseError:
+                tier_escalations.inc(reason="invalid_response")
+                reason = "escalated"
+        with self._tier_call("pro", reason):
+            return await self.llm.send_async(prompt, response_model=Response)
 
-        # Traer productos desde base de datos
-        products = get_all_products()
-        product_info = "\n".join([
-            f"- {p.name}: {p.description}. Precio: ${p.price}. Stock: {'Sí' if p.in_stock else 'No'}. Descuento: {p.discount_percent}%."
-            for p in products
-        ])
+    def get_response(self, chat_history: List[Message], use_cache: bool = True) -> Response:
+        # Preguntas obvias de respuesta fija: el clasificador local evita la llamada al LLM
+        with span("fast_path"):
+            # El intent del clasificador local sirve para la respuesta fija y para elegir el tier
+            prediction = self.fast_path.classify(chat_history)
+            fast = self.fast_path.try_answer(chat_history, prediction)
+        if fast is not None:
+            turns_by_path.inc(path="fast_path")
+            return fast
 
+        with span("catalog"):
+            snapshot = get_catalog()
+        cache_key = self.response_cache.make_key(chat_history, snapshot.version, self.llm.model_name)
+        # use_cache=False: respuesta nueva aunque haya una cacheada (p. ej. al reproducir transcripts)
+        cached = self.response_cache.get(cache_key) if use_cache else None
+        if cached is not None:
+            turns_by_path.inc(path="response_cache")
+            return cached
+
+        # Solo los productos del catálogo cacheado relevantes para la conversación
+        with span("prompt_build"):
+            product_info = select_product_info(snapshot, self._product_query(chat_history))
+            prompt = self._build_prompt(chat_history, product_info)
+        turns_by_path.inc(path="llm")
+        response = self._ask_llm(chat_history, prompt, prediction)
+        self.response_cache.put(cache_key, response)
+        return response
+
+    async def get_response_async(self, chat_history: List[Message], use_cache: bool = True) -> Response:
+        with span("fast_path"):
+            prediction = self.fast_path.classify(chat_history)
+            fast = self.fast_path.try_answer(chat_history, prediction)
+        if fast is not None:
+            turns_by_path.inc(path="fast_path")
+            return fast
+
+        with span("catalog"):
+            snapshot = await get_catalog_async()
+        cache_key = self.response_cache.make_key(chat_history, snapshot.version, self.llm.model_name)
+        cached = self.response_cache.get(cache_key) if use_cache else None
+        if cached is not None:
+            turns_by_path.inc(path="response_cache")
+            return cached
+
+        with span("prompt_build"):
+            product_info = select_product_info(snapshot, self._product_query(chat_history))
+            prompt = self._build_prompt(chat_history, product_info)
+        turns_by_path.inc(path="llm")
+        response = await self._ask_llm_async(chat_history, prompt, prediction)
+        self.response_cache.put(cache_key, response)
+        return response
+
+    async def stream_response_async(self, chat_history: List[Message]):
+        # Emite ("delta", texto) con cada parte nueva de bot_msg y al final ("done", Response)
+        with span("fast_path"):
+            prediction = self.fast_path.classify(chat_history)
+            fast = self.fast_path.try_answer(chat_history, prediction)
+        if fast is not None:
+            turns_by_path.inc(path="fast_path")
+            yield "delta", fast.bot_msg
+            yield "done", fast
+            return
+
+        with span("catalog"):
+            snapshot = await get_catalog_async()
+        cache_key = self.response_cache.make_key(chat_history, snapshot.version, self.llm.model_name)
+        cached = self.response_cache.get(cache_key)
+        if cached is not None:
+            turns_by_path.inc(path="response_cache")
+            yield "delta", cached.bot_msg
+            yield "done", cached
+            return
+
+        with span("prompt_build"):
+            product_info = select_product_info(snapshot, self._product_query(chat_history))
+            prompt = self._build_prompt(chat_history, product_info)
+        turns_by_path.inc(path="llm")
+
+        tier, reason = self._choose_tier(chat_history, prediction)
+        router = self.fast_llm if tier == "fast" else self.llm
+        try:
+            with self._tier_call(tier, reason):
+                async for kind, payload in router.stream_response_async(prompt, Response, repair=tier == "pro"):
+                    if kind == "done":
+                        self.response_cache.put(cache_key, payload)
+                    yield kind, payload
+        except InvalidResponseError:
+            if tier != "fast":
+                raise
+            # El texto parcial ya se mostró: el "done" del tier pro lo reemplaza en el cliente
+            tier_escalations.inc(reason="invalid_response")
+            with self._tier_call("pro", "escalated"):
+                response = await self.llm.send_async(prompt, response_model=Response)
+            self.response_cache.put(cache_key, response)
+            yield "done", response
+
+    def _build_prompt(self, chat_history: List[Message], product_info: str) -> str:
+        formatted_history = self._format_chat_history(chat_history)
         valid_intents = ', '.join([f'"{e.value}"' for e in Intent])
 
-        prompt = f"""
+        return f"""
 {self.system_message}
 
 Estos son los productos disponibles actualmente:
@@ -106,9 +244,19 @@ Usá los datos reales de productos cuando sea relevante.
 Nunca inventes productos. No uses otros valores de intención que no estén listados.
 Respondé de forma clara, breve, y útil, como un agente experto.
 """
-        return self.gemini.send(prompt, response_model=Response)
+
+    def _product_query(self, chat_history: List[Message], turns: int = 3) -> str:
+        # Los últimos mensajes del usuario definen qué productos son relevantes
+        user_messages = [msg.content for msg in chat_history if msg.role == "user"]
+        return " ".join(user_messages[-turns:])
 
     def _format_chat_history(self, chat_history: List[Message]) -> str:
         if not chat_history:
             return "No previous messages."
-        return "\n".join([f"{msg.role}: {msg.content}" for msg in chat_history])
\ No newline at end of file
+
+        # Turnos recientes textuales y un resumen acotado de los anteriores
+        compacted = self.history_compactor.compact(chat_history)
+        recent = "\n".join([f"{msg.role}: {msg.content}" for msg in compacted.recent])
+        if not compacted.summary:
+            return recent
+        return f"Resumen de mensajes anteriores:\n{compacted.summary}\n\nMensajes recientes:\n{recent}"
\ No newline at end of file
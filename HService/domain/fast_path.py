@@ -0,0 +1,79 @@
+import json
+import os
+from pathlib import Path
+from typing import List
+
+from HService.domain.intent_classifier import INTENT_MODEL_PATH, IntentClassifier
+from HService.domain.models import Intent, Message, Response
+
+FAST_PATH_ENABLED = os.getenv("FAST_PATH_ENABLED", "1") == "1"
+# JSON {intent: respuesta} con las respuestas fijas aprobadas por el negocio; vacío = todo va al LLM
+FAST_PATH_TEMPLATES_PATH = os.getenv("FAST_PATH_TEMPLATES_PATH", "")
+# Vacío = el umbral recomendado en el reporte del entrenamiento (scripts.train_intent_classifier)
+FAST_PATH_THRESHOLD = os.getenv("FAST_PATH_THRESHOLD", "")
+
+
+def load_templates(path: str = FAST_PATH_TEMPLATES_PATH) -> dict[Intent, str]:
+    if not path:
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return {Intent(intent): text for intent, text in json.load(f).items()}
+
+def intent_report_path(model_path: str = INTENT_MODEL_PATH) -> str:
+    return str(Path(model_path).with_suffix(".report.json"))
+
+def load_threshold(model_path: str = INTENT_MODEL_PATH) -> float:
+    if FAST_PATH_THRESHOLD:
+        return float(FAST_PATH_THRESHOLD)
+    try:
+        with open(intent_report_path(model_path), encoding="utf-8") as f:
+            threshold = json.load(f).get("recommended_threshold")
+    except FileNotFoundError:
+        threshold = None
+    # Sin umbral medido no se responde nada sin el LLM
+    return float("inf") if threshold is None else float(threshold)
+
+
+# ---------------- Local Fast Path ----------------
+class FastPathResponder:
+    def __init__(
+        self,
+        classifier: IntentClassifier | None,
+        threshold: float = float("inf"),
+        templates: dict[Intent, str] | None = None,
+    ):
+        self.classifier = classifier
+        self.threshold = threshold
+        self.templates = templates or {}
+
+    @classmethod
+    def from_env(cls) -> "FastPathResponder":
+        if not FAST_PATH_ENABLED or not os.path.exists(INTENT_MODEL_PATH):
+            return cls(None)
+        # El clasificador también decide el tier del LLM, aunque no haya respuestas fijas configuradas
+        return cls(IntentClassifier.load(INTENT_MODEL_PATH), load_threshold(INTENT_MODEL_PATH), load_templates())
+
+    def classify(self, chat_history: List[Message]) -> tuple[Intent, float] | None:
+        user_messages = [msg.content for msg in chat_history if msg.role == "user"]
+        if self.classifier is None or not user_messages:
+            return None
+        return self.classifier.predict(user_messages[-1])
+
+    def try_answer(self, chat_history: List[Message], prediction: tuple[Intent, float] | None = None) -> Response | None:
+        # Solo el primer mensaje del usuario: después la respuesta depende del contexto de la charla.
+        # prediction: resultado de classify si el llamador ya lo tiene
+        if sum(1 for msg in chat_history if msg.role == "user") != 1:
+            return None
+        if prediction is None:
+            prediction = self.classify(chat_history)
+        if prediction is None:
+            return None
+        intent, confidence = prediction
+        if confidence < self.threshold or intent not in self.templates:
+            return None
+        return Response(
+            thought_process_for_intent=f"Clasificador local: {intent.value} (confianza {confidence:.2f})",
+            intent=intent,
+            bot_msg=self.templates[intent],
+            is_ticket_closed=False,
+        )
@@ -0,0 +1,126 @@
+import hashlib
+import os
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from HService.domain.models import Message
+
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "1500"))
+HISTORY_KEEP_LAST = int(os.getenv("HISTORY_KEEP_LAST", "8"))
+# La ventana avanza de a varios mensajes para no recalcular el resumen en cada turno
+HISTORY_WINDOW_STEP = int(os.getenv("HISTORY_WINDOW_STEP", "4"))
+
+
+def estimate_tokens(text: str) -> int:
+    # Aproximación barata: ~4 caracteres por token
+    return len(text) // 4 + 1
+
+
+@dataclass(frozen=True)
+class CompactedHistory:
+    summary: str
+    recent: list[Message]
+
+
+# ---------------- History Compactor ----------------
+class HistoryCompactor:
+    def __init__(
+        self,
+        token_budget: int = HISTORY_TOKEN_BUDGET,
+        keep_last: int = HISTORY_KEEP_LAST,
+        window_step: int = HISTORY_WINDOW_STEP,
+        max_cached_summaries: int = 2048,
+        summary_line_chars: int = 160,
+    ):
+        self.token_budget = token_budget
+        self.keep_last = keep_last
+        self.window_step = max(1, window_step)
+        self.summary_line_chars = summary_line_chars
+        # El resumen ocupa como mucho un tercio del presupuesto; el resto es para los turnos textuales
+        self.summary_budget = token_budget // 3
+        self.max_cached_summaries = max_cached_summaries
+        # digest del prefijo resumido -> resumen; compartido entre conversaciones
+        self._summaries: OrderedDict[bytes, str] = OrderedDict()
+
+    def compact(self, chat_history: list[Message]) -> CompactedHistory:
+        split = self._window_start(chat_history)
+        recent = self._fit_budget(chat_history[split:], self.token_budget - self.summary_budget)
+        split = len(chat_history) - len(recent)
+        return CompactedHistory(summary=self._summary_for(chat_history, split), recent=recent)
+
+    def _window_start(self, chat_history: list[Message]) -> int:
+        overflow = len(chat_history) - self.keep_last
+        if overflow <= 0:
+            return 0
+        # Redondeamos hacia abajo al múltiplo de window_step: el corte solo se mueve cada tantos mensajes
+        # y siempre quedan al menos keep_last mensajes textuales
+        return overflow // self.window_step * self.window_step
+
+    def _fit_budget(self, messages: list[Message], budget: int) -> list[Message]:
+        kept = []
+        used = 0
+        for msg in reversed(messages):
+            cost = estimate_tokens(msg.content) + 2
+            if kept and used + cost > budget:
+                break
+            if not kept and cost > budget:
+                # El último mensaje siempre entra, pero recortado al presupuesto
+                msg = Message(role=msg.role, content=self._truncate(msg.content, (budget - 2) * 4))
+                cost = budget
+            kept.append(msg)
+            used += cost
+        kept.reverse()
+        return kept
+
+    def _truncate(self, text: str, max_chars: int) -> str:
+        # Principio y final del mensaje: la pregunta suele estar en alguno de los dos extremos
+        marker = " […] "
+        if max_chars <= len(marker):
+            return text[:max(max_chars, 0)]
+        head = (max_chars - len(marker)) // 2
+        tail = max_chars - len(marker) - head
+        return text[:head] + marker + (text[-tail:] if tail else "")
+
+    def _summary_for(self, chat_history: list[Message], split: int) -> str:
+        if split == 0:
+            return ""
+
+        # Digests acumulativos de cada prefijo, para encontrar el último resumen ya calculado
+        digests = []
+        running = hashlib.blake2b(digest_size=16)
+        for msg in chat_history[:split]:
+            running.update(msg.role.encode())
+            running.update(b"\0")
+            running.update(msg.content.encode())
+            running.update(b"\0")
+            digests.append(running.copy().digest())
+
+        if digests[-1] in self._summaries:
+            self._summaries.move_to_end(digests[-1])
+            return self._summaries[digests[-1]]
+
+        summary, start = "", 0
+        for i in range(split - 1, -1, -1):
+            if digests[i] in self._summaries:
+                summary, start = self._summaries[digests[i]], i + 1
+                break
+
+        summary = self._extend_summary(summary, chat_history[start:split])
+        self._summaries[digests[-1]] = summary
+        if len(self._summaries) > self.max_cached_summaries:
+            self._summaries.popitem(last=False)
+        return summary
+
+    def _extend_summary(self, summary: str, messages: list[Message]) -> str:
+        # Resumen extractivo: una línea recortada por mensaje; si no entra, se descartan las más viejas
+        lines = summary.split("\n") if summary else []
+        for msg in messages:
+            text = " ".join(msg.content.split())
+            if len(text) > self.summary_line_chars:
+                text = text[: self.summary_line_chars - 1] + "…"
+            lines.append(f"{msg.role}: {text}")
+
+        used = sum(estimate_tokens(line) for line in lines)
+        while len(lines) > 1 and used > self.summary_budget:
+            used -= estimate_tokens(lines.pop(0))
+        return "\n".join(lines)
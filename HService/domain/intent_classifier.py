@@ -0,0 +1,110 @@
+import os
+import zlib
+from pathlib import Path
+
+import numpy as np
+
+from HService.domain.models import Intent
+from HService.domain.text import normalize_text
+
+INTENT_MODEL_PATH = os.getenv("INTENT_MODEL_PATH", str(Path(__file__).with_name("intent_model.npz")))
+FEATURE_DIM = 2 ** 14
+NGRAM_RANGE = (2, 3, 4)
+
+
+def ngram_features(text: str, dim: int = FEATURE_DIM) -> tuple[np.ndarray, np.ndarray]:
+    # n-gramas de caracteres con hashing trick; devuelve (índices, valores) normalizados L2
+    text = f" {normalize_text(text)} "
+    buckets = [
+        zlib.crc32(text[i:i + n].encode()) % dim
+        for n in NGRAM_RANGE
+        for i in range(len(text) - n + 1)
+    ]
+    if not buckets:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+    indices, counts = np.unique(np.asarray(buckets, dtype=np.int64), return_counts=True)
+    values = counts.astype(np.float32)
+    values /= np.linalg.norm(values)
+    return indices, values
+
+
+def _dense_batch(features: list[tuple[np.ndarray, np.ndarray]], dim: int) -> np.ndarray:
+    batch = np.zeros((len(features), dim), dtype=np.float32)
+    for row, (indices, values) in enumerate(features):
+        batch[row, indices] = values
+    return batch
+
+
+def _softmax(logits: np.ndarray) -> np.ndarray:
+    logits = logits - logits.max(axis=-1, keepdims=True)
+    exp = np.exp(logits)
+    return exp / exp.sum(axis=-1, keepdims=True)
+
+
+# ---------------- Intent Classifier ----------------
+class IntentClassifier:
+    def __init__(self, weights: np.ndarray, bias: np.ndarray, classes: list[Intent]):
+        self.weights = weights
+        self.bias = bias
+        self.classes = classes
+        self.dim = weights.shape[0]
+
+    def predict_proba(self, text: str) -> np.ndarray:
+        indices, values = ngram_features(text, self.dim)
+        # Producto disperso: solo las filas de los n-gramas presentes
+        return _softmax(values @ self.weights[indices] + self.bias)
+
+    def predict(self, text: str) -> tuple[Intent, float]:
+        probs = self.predict_proba(text)
+        best = int(probs.argmax())
+        return self.classes[best], float(probs[best])
+
+    @classmethod
+    def train(
+        cls,
+        texts: list[str],
+        labels: list[Intent],
+        dim: int = FEATURE_DIM,
+        epochs: int = 10,
+        batch_size: int = 256,
+        learning_rate: float = 50.0,
+        l2: float = 1e-6,
+        seed: int = 0,
+    ) -> "IntentClassifier":
+        classes = sorted(set(labels), key=lambda intent: intent.value)
+        class_index = {intent: i for i, intent in enumerate(classes)}
+        y = np.array([class_index[label] for label in labels])
+        features = [ngram_features(text, dim) for text in texts]
+
+        rng = np.random.default_rng(seed)
+        weights = np.zeros((dim, len(classes)), dtype=np.float32)
+        bias = np.zeros(len(classes), dtype=np.float32)
+
+        # Regresión logística multinomial con SGD por mini-batches
+        for epoch in range(epochs):
+            lr = learning_rate / np.sqrt(1 + epoch)
+            order = rng.permutation(len(features))
+            for start in range(0, len(order), batch_size):
+                batch_ids = order[start:start + batch_size]
+                x = _dense_batch([features[i] for i in batch_ids], dim)
+                probs = _softmax(x @ weights + bias)
+                probs[np.arange(len(batch_ids)), y[batch_ids]] -= 1.0
+                probs /= len(batch_ids)
+                weights -= lr * (x.T @ probs + l2 * weights)
+                bias -= lr * probs.sum(axis=0)
+
+        return cls(weights, bias, classes)
+
+    def save(self, path: str = INTENT_MODEL_PATH):
+        np.savez_compressed(
+            path,
+            weights=self.weights,
+            bias=self.bias,
+            classes=np.array([intent.value for intent in self.classes]),
+        )
+
+    @classmethod
+    def load(cls, path: str = INTENT_MODEL_PATH) -> "IntentClassifier":
+        with np.load(path) as data:
+            classes = [Intent(value) for value in data["classes"]]
+            return cls(data["weights"], data["bias"], classes)
@@ -0,0 +1,196 @@
+import asyncio
+import os
+import threading
+import time
+
+from tenacity import AsyncRetrying, Retrying, retry_if_exception, stop_after_attempt, wait_random_exponential
+
+LLM_RPM = float(os.getenv("LLM_RPM", "360"))
+LLM_TPM = float(os.getenv("LLM_TPM", "2000000"))
+LLM_MAX_WAITERS = int(os.getenv("LLM_MAX_WAITERS", "64"))
+LLM_MAX_QUEUE_WAIT = float(os.getenv("LLM_MAX_QUEUE_WAIT", "20"))
+LLM_MAX_ATTEMPTS = int(os.getenv("LLM_MAX_ATTEMPTS", "3"))
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+LLM_BREAKER_RESET_SECONDS = float(os.getenv("LLM_BREAKER_RESET_SECONDS", "30"))
+
+
+class LLMBusyError(Exception):
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def is_retryable(e: BaseException) -> bool:
+    # 429 y errores transitorios del proveedor; los errores de formato o de request no se reintentan
+    if isinstance(e, LLMBusyError):
+        return False
+    # Errores HTTP de los SDK de OpenAI y Mistral; las excepciones propias de cada SDK las agrega su proveedor
+    if getattr(e, "status_code", None) in (429, 500, 502, 503, 504):
+        return True
+    message = str(e).lower()
+    return "rate limit" in message or "429" in message
+
+
+# ---------------- Token Bucket ----------------
+class TokenBucket:
+    def __init__(self, per_minute: float, capacity: float | None = None):
+        self.rate = per_minute / 60.0
+        self.capacity = per_minute if capacity is None else capacity
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float) -> float:
+        # Descuenta ya (aunque quede en negativo) y devuelve cuánto hay que esperar para usarlo
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= min(amount, self.capacity)
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def refund(self, amount: float):
+        with self._lock:
+            self._tokens = min(self.capacity, self._tokens + min(amount, self.capacity))
+
+
+# ---------------- Circuit Breaker ----------------
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int = LLM_BREAKER_FAILURES, reset_timeout: float = LLM_BREAKER_RESET_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: float | None = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half_open" if time.monotonic() - self.opened_at >= self.reset_timeout else "open"
+
+    def before_call(self):
+        with self._lock:
+            if self.opened_at is None:
+                return
+            remaining = self.reset_timeout - (time.monotonic() - self.opened_at)
+            # Medio abierto: deja pasar una sola llamada de prueba
+            if remaining > 0 or self._probing:
+                raise LLMBusyError("LLM circuit breaker is open", retry_after=max(remaining, 1.0))
+            self._probing = True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._probing = False
+
+    def cancel_probe(self):
+        with self._lock:
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._probing or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self._probing = False
+
+
+# ---------------- Outbound Governor ----------------
+class LLMGovernor:
+    def __init__(
+        self,
+        rpm: float = LLM_RPM,
+        tpm: float = LLM_TPM,
+        max_waiters: int = LLM_MAX_WAITERS,
+        max_queue_wait: float = LLM_MAX_QUEUE_WAIT,
+        max_attempts: int = LLM_MAX_ATTEMPTS,
+        breaker: CircuitBreaker | None = None,
+        retryable=is_retryable,
+    ):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.max_waiters = max_waiters
+        self.max_queue_wait = max_queue_wait
+        self.max_attempts = max_attempts
+        self.breaker = breaker or CircuitBreaker()
+        self.retryable = retryable
+        self.waiters = 0
+        self._lock = threading.Lock()
+
+    def _reserve(self, tokens: int) -> float:
+        with self._lock:
+            if self.waiters >= self.max_waiters:
+                raise LLMBusyError("Too many requests waiting for the LLM", retry_after=self.max_queue_wait)
+            wait = max(self.requests.reserve(1), self.tokens.reserve(tokens))
+            if wait > self.max_queue_wait:
+                self.requests.refund(1)
+                self.tokens.refund(tokens)
+                raise LLMBusyError("LLM rate limit queue is full", retry_after=wait)
+            if wait > 0:
+                self.waiters += 1
+            return wait
+
+    def _done_waiting(self, wait: float):
+        if wait > 0:
+            with self._lock:
+                self.waiters -= 1
+
+    async def acquire(self, tokens: int):
+        wait = self._reserve(tokens)
+        try:
+            await asyncio.sleep(wait)
+        finally:
+            self._done_waiting(wait)
+
+    def acquire_sync(self, tokens: int):
+        wait = self._reserve(tokens)
+        try:
+            time.sleep(wait)
+        finally:
+            self._done_waiting(wait)
+
+    def _retry_policy(self) -> dict:
+        return dict(
+            retry=retry_if_exception(self.retryable),
+            wait=wait_random_exponential(multiplier=0.5, max=8),
+            stop=stop_after_attempt(self.max_attempts),
+            reraise=True,
+        )
+
+    def _record_error(self, e: BaseException):
+        # Solo las fallas del proveedor abren el circuito. Un request inválido o una cancelación no cuentan
+        # para ningún lado: liberan la llamada de prueba sin cerrar el circuito ni reiniciar las fallas
+        if isinstance(e, Exception) and not isinstance(e, LLMBusyError) and self.retryable(e):
+            self.breaker.record_failure()
+        else:
+            self.breaker.cancel_probe()
+
+    async def call(self, fn, tokens: int):
+        # fn es una función sin argumentos que devuelve la corrutina a esperar (una por intento)
+        self.breaker.before_call()
+        try:
+            async for attempt in AsyncRetrying(**self._retry_policy()):
+                with attempt:
+                    await self.acquire(tokens)
+                    result = await fn()
+        except BaseException as e:
+            self._record_error(e)
+            raise
+        self.breaker.record_success()
+        return result
+
+    def call_sync(self, fn, tokens: int):
+        self.breaker.before_call()
+        try:
+            for attempt in Retrying(**self._retry_policy()):
+                with attempt:
+                    self.acquire_sync(tokens)
+                    result = fn()
+        except BaseException as e:
+            self._record_error(e)
+            raise
+        self.breaker.record_success()
+        return result
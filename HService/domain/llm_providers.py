@@ -0,0 +1,493 @@
+import warnings
+warnings.filterwarnings("ignore", category=DeprecationWarning, module="google._upb._message")
+
+import asyncio
+import json
+import logging
+import os
+import random
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import AsyncIterator
+
+from dotenv import load_dotenv
+from fastapi import HTTPException
+from pydantic import ValidationError
+
+from HService.domain.history import estimate_tokens
+from HService.domain.llm_governor import LLMBusyError, LLMGovernor, is_retryable
+from HService.domain.models import Intent, Response
+from HService.domain.response_parser import IncrementalJSONParser, JSONStringFieldStreamer, ParseStats, extract_json_object
+from HService.service.observability import log_event, record_llm_usage, registry, span
+
+logger = logging.getLogger(__name__)
+
+parse_responses = registry.counter("hservice_llm_parse_total", "LLM responses parsed.")
+parse_failures = registry.counter("hservice_llm_parse_failures_total", "LLM responses that failed to parse or validate.")
+parse_repairs = registry.counter("hservice_llm_parse_repairs_total", "Repair requests sent after a parse failure.")
+
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+# Tokens de salida que se reservan en el límite por minuto además de los del prompt
+LLM_EXPECTED_OUTPUT_TOKENS = int(os.getenv("LLM_EXPECTED_OUTPUT_TOKENS", "400"))
+LLM_STRUCTURED_OUTPUT = os.getenv("LLM_STRUCTURED_OUTPUT", "1") == "1"
+LLM_WARMUP_PROMPT = os.getenv("LLM_WARMUP_PROMPT", 'Respondé solo con {"ok": true}')
+
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-1.5-pro")
+GEMINI_FAST_MODEL = os.getenv("GEMINI_FAST_MODEL", "gemini-1.5-flash")
+OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+MISTRAL_MODEL = os.getenv("MISTRAL_MODEL", "mistral-small-latest")
+
+
+class InvalidResponseError(HTTPException):
+    # La respuesta no valida contra el modelo pedido (después de reparar, si se intentó); 500 para el cliente
+    def __init__(self, model_name: str):
+        super().__init__(status_code=500, detail=f"Invalid response format from {model_name}.")
+
+
+@dataclass
+class LLMReply:
+    # Texto generado (o una parte, en streaming) y el conteo de tokens si el proveedor lo informa
+    text: str
+    prompt_tokens: int | None = None
+    response_tokens: int | None = None
+
+
+# ---------------- Provider Interface ----------------
+class LLMProvider(ABC):
+    """Base de los proveedores de LLM que usa DialogueManager.
+
+    Concentra lo que es igual para todos: límites de tráfico, métricas de uso, validación
+    contra el modelo de respuesta y el único reintento de reparación. Cada proveedor solo
+    implementa _complete, _complete_sync y _open_stream/_iter_stream.
+    """
+
+    name = "llm"
+
+    def __init__(self, model_name: str, max_concurrency: int = LLM_MAX_CONCURRENCY, governor: LLMGovernor | None = None):
+        self.model_name = model_name
+        self.parse_stats = ParseStats()
+        self.governor = governor or LLMGovernor(retryable=self.is_retryable)
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+
+    def is_retryable(self, e: BaseException) -> bool:
+        return is_retryable(e)
+
+    # -------- Implementado por cada proveedor --------
+    @abstractmethod
+    async def _complete(self, prompt: str) -> LLMReply: ...
+
+    @abstractmethod
+    def _complete_sync(self, prompt: str) -> LLMReply: ...
+
+    @abstractmethod
+    async def _open_stream(self, prompt: str):
+        # Abre el stream; se reintenta junto con la reserva de cuota, antes de emitir texto
+        ...
+
+    @abstractmethod
+    def _iter_stream(self, stream) -> AsyncIterator[LLMReply]: ...
+
+    # -------- Llamadas --------
+    async def warm_up_async(self, prompt: str = LLM_WARMUP_PROMPT):
+        # Una llamada corta al arrancar: abre la conexión y carga lo que el SDK inicializa en el primer uso.
+        # Pasa por el governor como cualquier otra: consume cuota y cuenta para el circuit breaker
+        await self._generate_async(prompt)
+
+    def _generate(self, prompt: str) -> str:
+        with span("llm"):
+            reply = self.governor.call_sync(lambda: self._complete_sync(prompt), self._request_tokens(prompt))
+        self._record_usage(prompt, reply)
+        return reply.text
+
+    async def _generate_async(self, prompt: str) -> str:
+        with span("llm"):
+            reply = await self.governor.call(lambda: self._complete(prompt), self._request_tokens(prompt))
+        self._record_usage(prompt, reply)
+        return reply.text
+
+    def _record_usage(self, prompt: str, reply: LLMReply):
+        # Conteo real del proveedor si viene en la respuesta; si no, una estimación
+        prompt_tokens = reply.prompt_tokens or estimate_tokens(prompt)
+        response_tokens = reply.response_tokens or estimate_tokens(reply.text)
+        record_llm_usage(self.model_name, prompt_tokens, response_tokens)
+        log_event(
+            logger, "llm_call", logging.DEBUG,
+            provider=self.name, model=self.model_name, prompt_tokens=prompt_tokens, response_tokens=response_tokens,
+        )
+
+    def send(self, prompt: str, response_model, repair: bool = True):
+        # repair=False: una respuesta inválida falla enseguida con InvalidResponseError (para escalar a otro modelo)
+        try:
+            text = self._generate(prompt)
+            try:
+                return self.parse_response(text, response_model)
+            except ValueError as e:
+                if not repair:
+                    raise InvalidResponseError(self.model_name)
+                # Un único reintento de reparación antes de devolver error al usuario
+                self.parse_stats.repairs += 1
+                parse_repairs.inc(model=self.model_name)
+                repaired = self._generate(self._repair_prompt(prompt, text, e))
+                return self._parse_repaired(repaired, response_model)
+        except HTTPException as he:
+            raise he
+        except Exception as e:
+            self._raise_request_error(e)
+
+    async def send_async(self, prompt: str, response_model, repair: bool = True):
+        # Limita cuántas llamadas a este proveedor esperan en paralelo en este worker
+        async with self.semaphore:
+            text = await self._text_async(prompt)
+            return await self.parse_or_repair_async(prompt, text, response_model, repair=repair)
+
+    async def stream_async(self, prompt: str):
+        # Devuelve el texto crudo del modelo a medida que se genera
+        async with self.semaphore:
+            try:
+                with span("llm"):
+                    stream = await self.governor.call(lambda: self._open_stream(prompt), self._request_tokens(prompt))
+                chunks = []
+                usage = LLMReply("")
+                with span("llm_stream"):
+                    async for piece in self._iter_stream(stream):
+                        usage.prompt_tokens = piece.prompt_tokens or usage.prompt_tokens
+                        usage.response_tokens = piece.response_tokens or usage.response_tokens
+                        if piece.text:
+                            chunks.append(piece.text)
+                            yield piece.text
+                usage.text = "".join(chunks)
+                self._record_usage(prompt, usage)
+            except Exception as e:
+                self._raise_request_error(e)
+
+    async def stream_response_async(self, prompt: str, response_model, field: str = "bot_msg", repair: bool = True):
+        # Emite ("delta", texto) con cada parte nueva de field y al final ("done", respuesta validada)
+        streamer = JSONStringFieldStreamer(field)
+        parser = IncrementalJSONParser()
+        chunks = []
+        async for chunk in self.stream_async(prompt):
+            chunks.append(chunk)
+            parser.feed(chunk)
+            delta = streamer.feed(chunk)
+            if delta:
+                yield "delta", delta
+
+        parsed = parser.fields if parser.complete else None
+        yield "done", await self.parse_or_repair_async(prompt, "".join(chunks), response_model, parsed, repair)
+
+    async def parse_or_repair_async(
+        self, prompt: str, text: str, response_model, parsed: dict | None = None, repair: bool = True,
+    ):
+        try:
+            return self.parse_response(text, response_model, parsed)
+        except ValueError as e:
+            if not repair:
+                raise InvalidResponseError(self.model_name)
+            self.parse_stats.repairs += 1
+            parse_repairs.inc(model=self.model_name)
+            repaired = await self._text_async(self._repair_prompt(prompt, text, e))
+            return self._parse_repaired(repaired, response_model)
+
+    def parse_response(self, text: str, response_model, parsed: dict | None = None):
+        # parsed: campos ya obtenidos por el parser incremental durante el streaming
+        content = text.strip()
+        log_event(logger, "llm_raw_response", logging.DEBUG, model=self.model_name, text=content)
+        self.parse_stats.responses += 1
+        parse_responses.inc(model=self.model_name)
+
+        try:
+            with span("parse"):
+                data = parsed if parsed is not None else extract_json_object(content)
+            with span("validate"):
+                if "intent" in data and data["intent"] not in [e.value for e in Intent]:
+                    raise ValueError(f"Invalid intent value: {data['intent']}")
+                return response_model(**data)
+        except (ValidationError, ValueError, TypeError) as e:
+            self.parse_stats.failures += 1
+            parse_failures.inc(model=self.model_name)
+            log_event(
+                logger, "llm_parse_failed", logging.WARNING,
+                model=self.model_name, error=str(e), **self.parse_stats.as_dict(),
+            )
+            raise ValueError(str(e)) from e
+
+    def _parse_repaired(self, text: str, response_model):
+        try:
+            return self.parse_response(text, response_model)
+        except ValueError:
+            self.parse_stats.repair_failures += 1
+            raise InvalidResponseError(self.model_name)
+
+    def _repair_prompt(self, prompt: str, text: str, error: Exception) -> str:
+        return (
+            f"{prompt}\n\n"
+            f"Tu respuesta anterior no tenía el formato pedido ({error}):\n{text}\n\n"
+            "Respondé de nuevo únicamente con el objeto JSON válido, sin texto adicional."
+        )
+
+    async def _text_async(self, prompt: str) -> str:
+        try:
+            return await self._generate_async(prompt)
+        except HTTPException as he:
+            raise he
+        except Exception as e:
+            self._raise_request_error(e)
+
+    def _request_tokens(self, prompt: str) -> int:
+        return estimate_tokens(prompt) + LLM_EXPECTED_OUTPUT_TOKENS
+
+    def _raise_request_error(self, e: Exception):
+        log_event(logger, "llm_request_failed", logging.ERROR, provider=self.name, model=self.model_name, error=str(e))
+        if isinstance(e, LLMBusyError):
+            raise HTTPException(
+                status_code=503,
+                detail="The assistant is busy. Please try again shortly.",
+                headers={"Retry-After": str(int(e.retry_after) + 1)},
+            )
+        if "rate limit" in str(e).lower():
+            raise HTTPException(status_code=429, detail="Too many requests. Please try again later.")
+        raise HTTPException(status_code=500, detail="An error occurred while processing your request.")
+
+
+# ---------------- Gemini ----------------
+class GeminiProvider(LLMProvider):
+    name = "gemini"
+
+    def __init__(self, model_name: str = GEMINI_MODEL, structured_output: bool = LLM_STRUCTURED_OUTPUT, **kwargs):
+        # Import diferido: el SDK de Gemini tarda casi un segundo en importarse
+        import google.generativeai as genai
+
+        load_dotenv()
+        api_key = os.getenv("GOOGLE_API_KEY")
+        if not api_key:
+            raise ValueError("GOOGLE_API_KEY not found in environment variables")
+
+        super().__init__(model_name, **kwargs)
+        genai.configure(api_key=api_key)
+        generation_config = None
+        if structured_output:
+            # El modelo genera directamente JSON que respeta el esquema de Response y el enum de Intent
+            generation_config = genai.GenerationConfig(response_mime_type="application/json", response_schema=Response)
+        self.model = genai.GenerativeModel(model_name, generation_config=generation_config)
+
+    def is_retryable(self, e: BaseException) -> bool:
+        from google.api_core import exceptions as google_exceptions
+        return isinstance(e, (
+            google_exceptions.TooManyRequests,
+            google_exceptions.ResourceExhausted,
+            google_exceptions.ServiceUnavailable,
+            google_exceptions.DeadlineExceeded,
+            google_exceptions.InternalServerError,
+        )) or is_retryable(e)
+
+    @staticmethod
+    def _reply(response, text: str) -> LLMReply:
+        usage = getattr(response, "usage_metadata", None)
+        return LLMReply(
+            text,
+            getattr(usage, "prompt_token_count", None) or None,
+            getattr(usage, "candidates_token_count", None) or None,
+        )
+
+    async def _complete(self, prompt: str) -> LLMReply:
+        response = await self.model.generate_content_async(prompt)
+        return self._reply(response, response.text)
+
+    def _complete_sync(self, prompt: str) -> LLMReply:
+        response = self.model.generate_content(prompt)
+        return self._reply(response, response.text)
+
+    async def _open_stream(self, prompt: str):
+        return await self.model.generate_content_async(prompt, stream=True)
+
+    async def _iter_stream(self, stream):
+        async for chunk in stream:
+            yield self._reply(chunk, chunk.text)
+
+
+class GeminiFlashProvider(GeminiProvider):
+    # El mismo SDK con el modelo rápido y barato, para el tier "fast"
+    name = "gemini-flash"
+
+    def __init__(self, model_name: str = GEMINI_FAST_MODEL, **kwargs):
+        super().__init__(model_name, **kwargs)
+
+
+# ---------------- OpenAI ----------------
+class OpenAIProvider(LLMProvider):
+    name = "openai"
+
+    def __init__(self, model_name: str = OPENAI_MODEL, **kwargs):
+        # Import diferido: el SDK solo hace falta si el proveedor está configurado
+        from openai import AsyncOpenAI, OpenAI
+
+        load_dotenv()
+        api_key = os.getenv("OPENAI_API_KEY")
+        if not api_key:
+            raise ValueError("OPENAI_API_KEY not found in environment variables")
+
+        super().__init__(model_name, **kwargs)
+        self.client = AsyncOpenAI(api_key=api_key, max_retries=0)
+        self.sync_client = OpenAI(api_key=api_key, max_retries=0)
+
+    def is_retryable(self, e: BaseException) -> bool:
+        import openai
+        return isinstance(e, (openai.APIConnectionError, openai.APITimeoutError)) or is_retryable(e)
+
+    def _request(self, prompt: str) -> dict:
+        return dict(
+            model=self.model_name,
+            messages=[{"role": "user", "content": prompt}],
+            response_format={"type": "json_object"},
+        )
+
+    @staticmethod
+    def _reply(response) -> LLMReply:
+        usage = response.usage
+        return LLMReply(
+            response.choices[0].message.content or "",
+            usage.prompt_tokens if usage else None,
+            usage.completion_tokens if usage else None,
+        )
+
+    async def _complete(self, prompt: str) -> LLMReply:
+        return self._reply(await self.client.chat.completions.create(**self._request(prompt)))
+
+    def _complete_sync(self, prompt: str) -> LLMReply:
+        return self._reply(self.sync_client.chat.completions.create(**self._request(prompt)))
+
+    async def _open_stream(self, prompt: str):
+        return await self.client.chat.completions.create(
+            **self._request(prompt), stream=True, stream_options={"include_usage": True}
+        )
+
+    async def _iter_stream(self, stream):
+        async for chunk in stream:
+            text = (chunk.choices[0].delta.content or "") if chunk.choices else ""
+            usage = chunk.usage
+            yield LLMReply(text, usage.prompt_tokens if usage else None, usage.completion_tokens if usage else None)
+
+
+# ---------------- Mistral ----------------
+class MistralProvider(LLMProvider):
+    name = "mistral"
+
+    def __init__(self, model_name: str = MISTRAL_MODEL, **kwargs):
+        from mistralai import Mistral
+
+        load_dotenv()
+        api_key = os.getenv("MISTRAL_API_KEY")
+        if not api_key:
+            raise ValueError("MISTRAL_API_KEY not found in environment variables")
+
+        super().__init__(model_name, **kwargs)
+        self.client = Mistral(api_key=api_key)
+
+    def _request(self, prompt: str) -> dict:
+        return dict(
+            model=self.model_name,
+            messages=[{"role": "user", "content": prompt}],
+            response_format={"type": "json_object"},
+        )
+
+    @staticmethod
+    def _reply(response) -> LLMReply:
+        usage = response.usage
+        return LLMReply(
+            response.choices[0].message.content or "",
+            usage.prompt_tokens if usage else None,
+            usage.completion_tokens if usage else None,
+        )
+
+    async def _complete(self, prompt: str) -> LLMReply:
+        return self._reply(await self.client.chat.complete_async(**self._request(prompt)))
+
+    def _complete_sync(self, prompt: str) -> LLMReply:
+        return self._reply(self.client.chat.complete(**self._request(prompt)))
+
+    async def _open_stream(self, prompt: str):
+        return await self.client.chat.stream_async(**self._request(prompt))
+
+    async def _iter_stream(self, stream):
+        async for event in stream:
+            chunk = event.data
+            text = (chunk.choices[0].delta.content or "") if chunk.choices else ""
+            usage = chunk.usage
+            yield LLMReply(text, usage.prompt_tokens if usage else None, usage.completion_tokens if usage else None)
+
+
+# ---------------- Fake (local) ----------------
+class FakeProvider(LLMProvider):
+    """Proveedor local sin red para pruebas y benchmarks.
+
+    Responde un JSON válido de Response con una latencia normal más una cola lenta
+    opcional (tail_probability, tail_latency) para simular el p99 de un proveedor real.
+    Con invalid_probability, una parte de las respuestas no valida contra Response.
+    """
+
+    def __init__(
+        self,
+        name: str = "fake",
+        latency: float = 0.5,
+        jitter: float = 0.1,
+        tail_probability: float = 0.0,
+        tail_latency: float = 5.0,
+        intent: Intent = Intent.place_order,
+        invalid_probability: float = 0.0,
+        seed: int = 0,
+        **kwargs,
+    ):
+        super().__init__(f"{name}-model", **kwargs)
+        self.name = name
+        self.latency = latency
+        self.jitter = jitter
+        self.tail_probability = tail_probability
+        self.tail_latency = tail_latency
+        self.intent = intent
+        self.invalid_probability = invalid_probability
+        self.rng = random.Random(seed)
+        self.calls = 0
+
+    def _delay(self) -> float:
+        if self.rng.random() < self.tail_probability:
+            return self.tail_latency
+        return max(0.0, self.rng.gauss(self.latency, self.jitter))
+
+    def _text(self) -> str:
+        if self.rng.random() < self.invalid_probability:
+            return json.dumps({"bot_msg": "Respuesta sin el resto de los campos.", "intent": "unknown"})
+        return json.dumps({
+            "thought_process_for_intent": f"Respuesta simulada por {self.name}.",
+            "intent": self.intent.value,
+            "bot_msg": "¡Claro! Te cuento las opciones disponibles y cómo seguir con tu compra. " * 3,
+            "is_ticket_closed": False,
+        }, ensure_ascii=False)
+
+    async def _complete(self, prompt: str) -> LLMReply:
+        self.calls += 1
+        await asyncio.sleep(self._delay())
+        return LLMReply(self._text())
+
+    def _complete_sync(self, prompt: str) -> LLMReply:
+        self.calls += 1
+        time.sleep(self._delay())
+        return LLMReply(self._text())
+
+    async def _open_stream(self, prompt: str):
+        self.calls += 1
+        return self._text(), self._delay()
+
+    async def _iter_stream(self, stream):
+        text, delay = stream
+        for i in range(0, len(text), 24):
+            await asyncio.sleep(delay / 10)
+            yield LLMReply(text[i:i + 24])
+
+
+PROVIDERS = {
+    "gemini": GeminiProvider,
+    "gemini-flash": GeminiFlashProvider,
+    "openai": OpenAIProvider,
+    "mistral": MistralProvider,
+}
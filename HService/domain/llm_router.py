@@ -0,0 +1,227 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+from HService.domain.llm_providers import PROVIDERS, LLMProvider
+from HService.service.observability import log_event, percentile, registry
+
+logger = logging.getLogger(__name__)
+
+# Proveedores en orden de preferencia, p. ej. "gemini,openai"
+LLM_PROVIDERS = os.getenv("LLM_PROVIDERS", "gemini")
+# Tier rápido y barato para los turnos simples, p. ej. "gemini-flash"; vacío = todo va al tier pro
+LLM_FAST_PROVIDERS = os.getenv("LLM_FAST_PROVIDERS", "")
+LLM_HEDGE = os.getenv("LLM_HEDGE", "0") == "1"
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))
+LLM_HEDGE_MIN_DELAY = float(os.getenv("LLM_HEDGE_MIN_DELAY", "0.5"))
+# Demora antes de tener suficientes muestras para estimar el percentil
+LLM_HEDGE_DEFAULT_DELAY = float(os.getenv("LLM_HEDGE_DEFAULT_DELAY", "3"))
+LLM_LATENCY_WINDOW = int(os.getenv("LLM_LATENCY_WINDOW", "200"))
+LLM_LATENCY_MIN_SAMPLES = int(os.getenv("LLM_LATENCY_MIN_SAMPLES", "20"))
+# Segundos durante los que un error baja la prioridad de un proveedor
+LLM_ERROR_WINDOW_SECONDS = float(os.getenv("LLM_ERROR_WINDOW_SECONDS", "60"))
+
+routed_calls = registry.counter("hservice_llm_routed_total", "LLM calls by the provider chosen first.")
+hedged_calls = registry.counter("hservice_llm_hedges_total", "Hedged requests fired, by hedge provider.")
+hedge_wins = registry.counter("hservice_llm_hedge_wins_total", "Hedged calls by the provider that answered first.")
+failovers = registry.counter("hservice_llm_failovers_total", "Calls retried on another provider after an error.")
+
+
+# ---------------- Latency Tracker ----------------
+class LatencyTracker:
+    # Ventana de las últimas latencias exitosas de un proveedor y de sus resultados recientes.
+    # Las fallas no son muestras de latencia: un proveedor que falla rápido no puede parecer el más veloz
+    def __init__(self, window: int = LLM_LATENCY_WINDOW, error_window: float = LLM_ERROR_WINDOW_SECONDS):
+        self._samples: deque[float] = deque(maxlen=window)
+        self._outcomes: deque[tuple[float, bool]] = deque(maxlen=window)
+        self.error_window = error_window
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+            self._outcomes.append((time.monotonic(), True))
+
+    def observe_failure(self):
+        with self._lock:
+            self._outcomes.append((time.monotonic(), False))
+
+    def error_rate(self) -> float:
+        # Solo los resultados de los últimos error_window segundos: un proveedor degradado vuelve a
+        # probarse cuando sus errores quedan atrás
+        cutoff = time.monotonic() - self.error_window
+        with self._lock:
+            recent = [ok for at, ok in self._outcomes if at >= cutoff]
+        return recent.count(False) / len(recent) if recent else 0.0
+
+    def percentile(self, pct: float) -> float | None:
+        with self._lock:
+            if not self._samples:
+                return None
+            samples = list(self._samples)
+        return percentile(samples, pct)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+
+# ---------------- LLM Router ----------------
+class LLMRouter:
+    """Elige el proveedor por latencia observada y, opcionalmente, cubre la cola con hedging.
+
+    Expone la misma interfaz que un LLMProvider. Con hedging, si el proveedor elegido no
+    respondió pasado su p95 se lanza el mismo prompt al siguiente y gana el primero que
+    devuelve una respuesta válida; el otro se cancela.
+    """
+
+    def __init__(
+        self,
+        providers: list[LLMProvider],
+        hedge: bool = LLM_HEDGE,
+        hedge_percentile: float = LLM_HEDGE_PERCENTILE,
+        hedge_min_delay: float = LLM_HEDGE_MIN_DELAY,
+        hedge_default_delay: float = LLM_HEDGE_DEFAULT_DELAY,
+        min_samples: int = LLM_LATENCY_MIN_SAMPLES,
+    ):
+        if not providers:
+            raise ValueError("At least one LLM provider is required")
+        self.providers = providers
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_default_delay = hedge_default_delay
+        self.min_samples = min_samples
+        self.latency = {id(p): LatencyTracker() for p in providers}
+        # Para la clave del cache de respuestas: cualquiera de los modelos puede contestar
+        self.model_name = "+".join(p.model_name for p in providers)
+
+    def ranked(self) -> list[LLMProvider]:
+        # Primero los de circuito cerrado; entre ellos, menor tasa de errores reciente y después menor
+        # mediana. Sin muestras suficientes un proveedor se prueba primero (mediana 0) y el orden
+        # configurado desempata
+        def key(item):
+            i, p = item
+            tracker = self.latency[id(p)]
+            median = tracker.percentile(50) if len(tracker) >= self.min_samples else 0.0
+            return p.governor.breaker.state == "open", tracker.error_rate(), median, i
+        return [p for _, p in sorted(enumerate(self.providers), key=key)]
+
+    def hedge_delay(self, provider: LLMProvider) -> float:
+        tracker = self.latency[id(provider)]
+        if len(tracker) < self.min_samples:
+            return self.hedge_default_delay
+        return max(self.hedge_min_delay, tracker.percentile(self.hedge_percentile))
+
+    async def _timed(self, provider: LLMProvider, coro):
+        # Solo las respuestas exitosas son muestras de latencia; una cancelación (el perdedor de un
+        # hedge) no se registra
+        tracker = self.latency[id(provider)]
+        start = time.perf_counter()
+        try:
+            result = await coro
+        except Exception:
+            tracker.observe_failure()
+            raise
+        tracker.observe(time.perf_counter() - start)
+        return result
+
+    def send(self, prompt: str, response_model, repair: bool = True):
+        ranked = self.ranked()
+        routed_calls.inc(provider=ranked[0].name)
+        for i, provider in enumerate(ranked):
+            tracker = self.latency[id(provider)]
+            start = time.perf_counter()
+            try:
+                result = provider.send(prompt, response_model, repair)
+            except Exception:
+                tracker.observe_failure()
+                if i == len(ranked) - 1:
+                    raise
+                failovers.inc(provider=ranked[i + 1].name)
+                continue
+            tracker.observe(time.perf_counter() - start)
+            return result
+
+    async def send_async(self, prompt: str, response_model, repair: bool = True):
+        ranked = self.ranked()
+        primary = ranked[0]
+        routed_calls.inc(provider=primary.name)
+        first = asyncio.create_task(self._timed(primary, primary.send_async(prompt, response_model, repair)))
+        if len(ranked) == 1:
+            return await first
+
+        backup = ranked[1]
+        try:
+            timeout = self.hedge_delay(primary) if self.hedge else None
+            await asyncio.wait({first}, timeout=timeout)
+            if first.done() and first.exception() is None:
+                return first.result()
+
+            second = asyncio.create_task(self._timed(backup, backup.send_async(prompt, response_model, repair)))
+            if first.done():
+                # El elegido falló: el mismo prompt va al siguiente proveedor
+                failovers.inc(provider=backup.name)
+                log_event(logger, "llm_failover", logging.WARNING, provider=primary.name, backup=backup.name)
+                try:
+                    return await second
+                except Exception:
+                    raise first.exception()
+
+            # Se demoró más que su p95: compiten los dos y gana la primera respuesta válida
+            hedged_calls.inc(provider=backup.name)
+            return await self._first_success(first, second)
+        finally:
+            if not first.done():
+                first.cancel()
+
+    async def _first_success(self, first: asyncio.Task, second: asyncio.Task):
+        pending = {first, second}
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        hedge_wins.inc(provider="primary" if task is first else "hedge")
+                        return task.result()
+                    error = error or task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def warm_up_async(self) -> dict[str, str]:
+        # Todos los proveedores en paralelo. No se mide: la primera llamada incluye el handshake y sesgaría
+        # la mediana. Devuelve los errores por proveedor
+        results = await asyncio.gather(*(p.warm_up_async() for p in self.providers), return_exceptions=True)
+        return {p.name: f"{type(r).__name__}: {r}" for p, r in zip(self.providers, results) if isinstance(r, Exception)}
+
+    async def stream_response_async(self, prompt: str, response_model, field: str = "bot_msg", repair: bool = True):
+        # Streaming: sin hedging (el texto ya se está mostrando); se elige el más rápido y se mide hasta el final
+        provider = self.ranked()[0]
+        routed_calls.inc(provider=provider.name)
+        tracker = self.latency[id(provider)]
+        start = time.perf_counter()
+        try:
+            async for event in provider.stream_response_async(prompt, response_model, field, repair):
+                yield event
+        except Exception:
+            tracker.observe_failure()
+            raise
+        tracker.observe(time.perf_counter() - start)
+
+
+def create_llm(names: str = LLM_PROVIDERS) -> LLMRouter:
+    providers = []
+    for name in [n.strip() for n in names.split(",") if n.strip()]:
+        if name not in PROVIDERS:
+            raise ValueError(f"Unknown LLM provider: {name}")
+        providers.append(PROVIDERS[name]())
+    return LLMRouter(providers)
+
+
+def create_fast_llm(names: str = LLM_FAST_PROVIDERS) -> LLMRouter | None:
+    return create_llm(names) if names.strip() else None
@@ -0,0 +1,204 @@
+import json
+import string
+
+_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+
+def _hex4(text: str) -> int:
+    # Exactamente 4 dígitos hex: int(..., 16) también aceptaría signos, espacios y "_"
+    if len(text) != 4 or not all(c in string.hexdigits for c in text):
+        raise ValueError(f"Invalid \\u escape: {text!r}")
+    return int(text, 16)
+
+
+# ---------------- Streamed field extraction ----------------
+# Extrae el valor de un campo string de un JSON que llega por partes: cada feed()
+# devuelve solo el texto nuevo del campo, ya decodificado, sin esperar el objeto completo.
+class JSONStringFieldStreamer:
+    def __init__(self, field: str):
+        self._key = json.dumps(field)
+        self._buffer = ""
+        self._pos = 0
+        self._in_value = False
+        self.done = False
+
+    def feed(self, chunk: str) -> str:
+        self._buffer += chunk
+        if self.done:
+            return ""
+        if not self._in_value and not self._find_value_start():
+            return ""
+        return self._read_value()
+
+    def _find_value_start(self) -> bool:
+        key_at = self._buffer.find(self._key, self._pos)
+        if key_at < 0:
+            return False
+        i = key_at + len(self._key)
+        while i < len(self._buffer) and self._buffer[i] in " \t\r\n:":
+            i += 1
+        if i >= len(self._buffer):
+            return False
+        if self._buffer[i] != '"':
+            # El campo existe pero no es un string: no hay nada que transmitir
+            self.done = True
+            return False
+        self._pos = i + 1
+        self._in_value = True
+        return True
+
+    def _read_value(self) -> str:
+        out = []
+        buf = self._buffer
+        i = self._pos
+        while i < len(buf):
+            ch = buf[i]
+            if ch == '"':
+                self.done = True
+                i += 1
+                break
+            if ch != "\\":
+                out.append(ch)
+                i += 1
+                continue
+            # Escape incompleto: esperamos al próximo chunk
+            if i + 1 >= len(buf):
+                break
+            esc = buf[i + 1]
+            if esc != "u":
+                out.append(_ESCAPES.get(esc, esc))
+                i += 2
+                continue
+            if i + 6 > len(buf):
+                break
+            try:
+                code = _hex4(buf[i + 2:i + 6])
+                if 0xD800 <= code < 0xDC00:
+                    # Par sustituto: necesitamos las dos mitades para emitir el carácter
+                    if i + 12 > len(buf):
+                        break
+                    if buf[i + 6:i + 8] != "\\u":
+                        raise ValueError("Unpaired surrogate in \\u escape")
+                    low = _hex4(buf[i + 8:i + 12])
+                    if not 0xDC00 <= low < 0xE000:
+                        raise ValueError("Unpaired surrogate in \\u escape")
+                    out.append(chr(0x10000 + ((code - 0xD800) << 10) + (low - 0xDC00)))
+                    i += 12
+                    continue
+                if 0xDC00 <= code < 0xE000:
+                    raise ValueError("Unpaired surrogate in \\u escape")
+            except ValueError:
+                # Escape inválido: se deja de transmitir el campo y el parse final (o la reparación)
+                # se ocupa de la respuesta entera
+                self.done = True
+                break
+            out.append(chr(code))
+            i += 6
+        self._pos = i
+        return "".join(out)
+
+
+# ---------------- Incremental object parsing ----------------
+# Parser incremental de un objeto JSON plano: a medida que llegan los chunks va cerrando
+# cada campo de primer nivel, así al final no hay que volver a parsear todo el texto.
+class IncrementalJSONParser:
+    def __init__(self):
+        self.fields: dict = {}
+        self.complete = False
+        self.error: ValueError | None = None
+        self._started = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._key: str | None = None
+        self._token_start: int | None = None
+        self._length = 0
+        self._text = ""
+
+    def feed(self, chunk: str):
+        if self.complete or self.error is not None:
+            return
+        self._text += chunk
+        try:
+            self._scan()
+        except ValueError as e:
+            self.error = e
+
+    def _scan(self):
+        text = self._text
+        for i in range(self._length, len(text)):
+            ch = text[i]
+            if not self._started:
+                if ch == "{":
+                    self._started = True
+                    self._depth = 1
+                    self._token_start = i + 1
+                continue
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                continue
+            if ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._close_value(text, i)
+                    self.complete = True
+                    self._length = i + 1
+                    return
+            elif self._depth == 1 and ch == ":":
+                self._key = json.loads(text[self._token_start:i])
+                self._token_start = i + 1
+            elif self._depth == 1 and ch == ",":
+                self._close_value(text, i)
+                self._token_start = i + 1
+        self._length = len(text)
+
+    def result(self) -> dict:
+        if self.error is not None:
+            raise self.error
+        if not self.complete:
+            raise ValueError("Incomplete JSON object in model output.")
+        return self.fields
+
+    def _close_value(self, text: str, end: int):
+        if self._key is None:
+            return
+        self.fields[self._key] = json.loads(text[self._token_start:end])
+        self._key = None
+
+
+def extract_json_object(text: str) -> dict:
+    # Primer objeto JSON completo del texto; tolera texto o bloques ``` alrededor
+    start = text.find("{")
+    if start < 0:
+        raise ValueError("No valid JSON block found.")
+    data, _ = json.JSONDecoder().raw_decode(text, start)
+    if not isinstance(data, dict):
+        raise ValueError("Model output is not a JSON object.")
+    return data
+
+
+# ---------------- Parse statistics ----------------
+class ParseStats:
+    def __init__(self):
+        self.responses = 0
+        self.failures = 0
+        self.repairs = 0
+        self.repair_failures = 0
+
+    def as_dict(self) -> dict:
+        return {
+            "responses": self.responses,
+            "parse_failures": self.failures,
+            "parse_failure_rate": self.failures / self.responses if self.responses else 0.0,
+            "repairs": self.repairs,
+            "repair_failures": self.repair_failures,
+        }
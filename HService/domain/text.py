@@ -0,0 +1,11 @@
+import re
+import unicodedata
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+def normalize_text(text: str) -> str:
+    # "¿Qué medios de PAGO aceptan?" y "que medios de pago aceptan" quedan iguales: sin acentos, mayúsculas ni signos
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return " ".join(_WORD_RE.findall(text))
@@ -0,0 +1,58 @@
+import os
+from typing import List
+
+from HService.domain.models import Intent, Message
+
+# Turnos del usuario y caracteres de historial hasta los que un turno puede ir al tier rápido
+LLM_FAST_MAX_USER_TURNS = int(os.getenv("LLM_FAST_MAX_USER_TURNS", "4"))
+LLM_FAST_MAX_HISTORY_CHARS = int(os.getenv("LLM_FAST_MAX_HISTORY_CHARS", "4000"))
+# Confianza mínima del clasificador local en el intent del último mensaje
+LLM_FAST_MIN_CONFIDENCE = float(os.getenv("LLM_FAST_MIN_CONFIDENCE", "0.6"))
+
+# Intents que piden razonar sobre el caso del usuario (reclamos, dinero, cambios a un pedido): siempre al tier pro
+PRO_TIER_INTENTS = frozenset({
+    Intent.complaint,
+    Intent.payment_issue,
+    Intent.get_refund,
+    Intent.track_refund,
+    Intent.cancel_order,
+    Intent.change_order,
+    Intent.delete_account,
+    Intent.contact_human_agent,
+})
+
+
+# ---------------- Model Tier Policy ----------------
+class TierPolicy:
+    """Elige el tier del LLM para un turno: "fast" (modelo rápido y barato) o "pro".
+
+    Un turno va al tier rápido solo si la conversación es corta, el clasificador local
+    reconoce el intent con confianza y ese intent no está entre los que piden más
+    razonamiento. Devuelve el tier y el motivo, que se usa como label en las métricas.
+    """
+
+    def __init__(
+        self,
+        max_user_turns: int = LLM_FAST_MAX_USER_TURNS,
+        max_history_chars: int = LLM_FAST_MAX_HISTORY_CHARS,
+        min_confidence: float = LLM_FAST_MIN_CONFIDENCE,
+        pro_intents: frozenset[Intent] = PRO_TIER_INTENTS,
+    ):
+        self.max_user_turns = max_user_turns
+        self.max_history_chars = max_history_chars
+        self.min_confidence = min_confidence
+        self.pro_intents = pro_intents
+
+    def choose(self, chat_history: List[Message], prediction: tuple[Intent, float] | None) -> tuple[str, str]:
+        user_turns = sum(1 for msg in chat_history if msg.role == "user")
+        if user_turns > self.max_user_turns or sum(len(msg.content) for msg in chat_history) > self.max_history_chars:
+            return "pro", "long_history"
+        # Sin clasificador entrenado no hay forma de saber si el turno es simple
+        if prediction is None:
+            return "pro", "no_signal"
+        intent, confidence = prediction
+        if intent in self.pro_intents:
+            return "pro", "complex_intent"
+        if confidence < self.min_confidence:
+            return "pro", "low_confidence"
+        return "fast", "simple"
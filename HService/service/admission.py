@@ -0,0 +1,134 @@
+import asyncio
+import logging
+import math
+import os
+import time
+from contextlib import contextmanager
+
+from fastapi import HTTPException, Request
+
+from HService.service.observability import log_event, registry
+
+logger = logging.getLogger(__name__)
+
+# Tiempo total que puede llevar un turno de chat, incluida la espera en las colas del LLM
+CHAT_DEADLINE_SECONDS = float(os.getenv("CHAT_DEADLINE_SECONDS", "30"))
+# Turnos en curso por worker a partir de los cuales se rechaza con 503
+ADMISSION_MAX_IN_FLIGHT = int(os.getenv("ADMISSION_MAX_IN_FLIGHT", "64"))
+# Turnos que el worker atiende en paralelo sin esperar (el semáforo de cada proveedor de LLM)
+ADMISSION_CONCURRENCY = int(os.getenv("ADMISSION_CONCURRENCY", os.getenv("LLM_MAX_CONCURRENCY", "16")))
+# Espera estimada máxima antes de empezar a atender un turno nuevo
+ADMISSION_MAX_WAIT = float(os.getenv("ADMISSION_MAX_WAIT", "10"))
+ADMISSION_LATENCY_ALPHA = float(os.getenv("ADMISSION_LATENCY_ALPHA", "0.1"))
+
+admission_rejections = registry.counter("hservice_admission_rejections_total", "Chat turns shed with 503, by reason.")
+deadline_exceeded = registry.counter("hservice_chat_deadline_exceeded_total", "Chat turns cut off by their deadline.")
+client_disconnects = registry.counter("hservice_chat_client_disconnects_total", "Chat turns cancelled because the client went away.")
+
+
+# ---------------- Admission Control ----------------
+class AdmissionController:
+    """Rechaza turnos nuevos con un 503 rápido cuando el worker ya está saturado.
+
+    La espera estimada de un turno nuevo es la cola por delante (turnos en curso por encima de
+    la concurrencia) dividida por la concurrencia, por la latencia media reciente. Se rechaza
+    si la cola supera max_in_flight o si la espera supera max_wait: el cliente reintenta según
+    Retry-After en vez de esperar a que su turno falle por timeout.
+    """
+
+    def __init__(
+        self,
+        max_in_flight: int = ADMISSION_MAX_IN_FLIGHT,
+        concurrency: int = ADMISSION_CONCURRENCY,
+        max_wait: float = ADMISSION_MAX_WAIT,
+        latency_alpha: float = ADMISSION_LATENCY_ALPHA,
+    ):
+        self.max_in_flight = max_in_flight
+        self.concurrency = concurrency
+        self.max_wait = max_wait
+        self.latency_alpha = latency_alpha
+        self.in_flight = 0
+        # Media móvil exponencial de la duración de los turnos admitidos
+        self.latency: float | None = None
+
+    def estimated_wait(self) -> float:
+        queued = self.in_flight + 1 - self.concurrency
+        if queued <= 0 or self.latency is None:
+            return 0.0
+        return queued / self.concurrency * self.latency
+
+    def check(self):
+        # Solo lee el estado del loop: sin locks ni awaits, el rechazo cuesta microsegundos
+        wait = self.estimated_wait()
+        if self.in_flight >= self.max_in_flight:
+            reason = "queue_depth"
+        elif wait > self.max_wait:
+            reason = "estimated_wait"
+        else:
+            return
+        admission_rejections.inc(reason=reason)
+        raise HTTPException(
+            status_code=503,
+            detail="The assistant is busy. Please try again shortly.",
+            headers={"Retry-After": str(max(1, math.ceil(wait)))},
+        )
+
+    @contextmanager
+    def slot(self):
+        self.in_flight += 1
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            elapsed = time.perf_counter() - start
+            self.latency = elapsed if self.latency is None else (
+                self.latency_alpha * elapsed + (1 - self.latency_alpha) * self.latency
+            )
+
+    @contextmanager
+    def admit(self):
+        self.check()
+        with self.slot():
+            yield
+
+
+def _route(request: Request) -> str:
+    # La plantilla de la ruta, no el path: los ids de sesión no deben crear series nuevas
+    route = request.scope.get("route")
+    return route.path if route is not None else request.url.path
+
+
+async def wait_for_disconnect(request: Request):
+    # Con el body ya leído, el próximo mensaje del servidor ASGI es http.disconnect
+    while True:
+        message = await request.receive()
+        if message["type"] == "http.disconnect":
+            return
+
+
+async def run_turn(request: Request, coro, deadline: float = CHAT_DEADLINE_SECONDS):
+    """Corre el turno con un deadline total y lo cancela si el cliente se desconecta.
+
+    La cancelación llega a la llamada al LLM en curso, a la espera en la cola del governor y a
+    los reintentos; una recarga del catálogo que ya empezó en un thread termina igual, porque
+    la comparten todos los requests.
+    """
+    work = asyncio.ensure_future(coro)
+    disconnect = asyncio.create_task(wait_for_disconnect(request))
+    try:
+        done, _ = await asyncio.wait({work, disconnect}, timeout=deadline, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        disconnect.cancel()
+        if not work.done():
+            work.cancel()
+
+    if work in done:
+        return work.result()
+    if disconnect in done:
+        client_disconnects.inc(route=_route(request))
+        log_event(logger, "chat_client_disconnected", route=_route(request))
+        # 499: el cliente cerró la conexión; nadie va a leer esta respuesta
+        raise HTTPException(status_code=499, detail="Client closed the request.")
+    deadline_exceeded.inc(route=_route(request))
+    raise HTTPException(status_code=504, detail="The assistant took too long to answer. Please try again.")
@@ -0,0 +1,209 @@
+import asyncio
+import json
+import os
+import statistics
+import time
+from contextlib import nullcontext
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Iterable
+
+from fastapi import HTTPException
+
+from HService.domain.models import Intent, Message
+from HService.service.observability import estimate_cost, llm_usage, percentile
+
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "32"))
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "1000"))
+# Items de batch en curso por worker, sumando todos los batches: el resto de la capacidad queda para el chat
+BATCH_MAX_IN_FLIGHT = int(os.getenv("BATCH_MAX_IN_FLIGHT", "8"))
+# Tiempo total de un /chat/batch; cada item tiene además el deadline de un turno de chat
+BATCH_DEADLINE_SECONDS = float(os.getenv("BATCH_DEADLINE_SECONDS", "900"))
+
+
+@dataclass
+class BatchItem:
+    id: str
+    chat_history: list[Message]
+    expected_intent: Intent | None = None
+
+
+@dataclass
+class BatchResult:
+    id: str
+    intent: str | None
+    expected_intent: str | None
+    correct: bool | None
+    bot_msg: str | None
+    is_ticket_closed: bool | None
+    latency_s: float
+    prompt_tokens: int
+    response_tokens: int
+    cost_usd: float
+    error: str | None = None
+
+
+def summarize_results(results: list[BatchResult], wall_seconds: float, processed: int) -> dict:
+    # processed: resultados de esta corrida (el resto vino del checkpoint); el throughput se mide solo con ellos
+    labeled = [r for r in results if r.correct is not None]
+    errors = [r for r in results if r.error is not None]
+    latencies = [r.latency_s for r in results if r.error is None]
+
+    per_intent = {}
+    for r in labeled:
+        hits, total = per_intent.get(r.expected_intent, (0, 0))
+        per_intent[r.expected_intent] = (hits + r.correct, total + 1)
+
+    cost = sum(r.cost_usd for r in results)
+    return {
+        "items": len(results),
+        "processed": processed,
+        "errors": len(errors),
+        "accuracy": round(sum(r.correct for r in labeled) / len(labeled), 4) if labeled else None,
+        "labeled": len(labeled),
+        "per_intent_accuracy": {k: round(h / t, 4) for k, (h, t) in sorted(per_intent.items())},
+        "wall_seconds": round(wall_seconds, 2),
+        "items_per_second": round(processed / wall_seconds, 2) if wall_seconds else 0.0,
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50) * 1000, 1),
+            "p95": round(percentile(latencies, 95) * 1000, 1),
+            "mean": round(statistics.fmean(latencies) * 1000, 1) if latencies else 0.0,
+        },
+        "tokens": {
+            "prompt": sum(r.prompt_tokens for r in results),
+            "response": sum(r.response_tokens for r in results),
+        },
+        "cost_usd": round(cost, 6),
+        "cost_per_item_usd": round(cost / len(results), 6) if results else 0.0,
+    }
+
+
+# ---------------- Checkpoint ----------------
+class BatchCheckpoint:
+    # Un resultado JSON por línea; al retomar se saltean los ids que ya tienen resultado sin error
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self._file = None
+
+    def load(self) -> dict[str, BatchResult]:
+        done = {}
+        if self.path.exists():
+            with self.path.open(encoding="utf-8") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    try:
+                        result = BatchResult(**json.loads(line))
+                    except (ValueError, TypeError):
+                        continue  # Última línea cortada por una interrupción
+                    if result.error is None:
+                        done[result.id] = result
+        return done
+
+    def write(self, result: BatchResult):
+        if self._file is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._file = self.path.open("a", encoding="utf-8")
+        self._file.write(json.dumps(asdict(result), ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+# ---------------- Batch Runner ----------------
+class BatchRunner:
+    """Corre los items con concurrency workers fijos.
+
+    slot, opcional, es un context manager async que cada item toma antes de llamar al
+    DialogueManager (p. ej. el cupo compartido de batches del worker); item_deadline corta los
+    items lentos. Sin use_response_cache los items no se responden desde la caché de respuestas.
+    """
+
+    def __init__(
+        self,
+        dialogue_manager,
+        concurrency: int = BATCH_CONCURRENCY,
+        checkpoint: BatchCheckpoint | None = None,
+        slot=None,
+        item_deadline: float | None = None,
+        use_response_cache: bool = True,
+    ):
+        if concurrency < 1:
+            raise ValueError("Batch concurrency must be at least 1")
+        self.dialogue_manager = dialogue_manager
+        self.concurrency = concurrency
+        self.checkpoint = checkpoint
+        self.slot = slot or nullcontext
+        self.item_deadline = item_deadline
+        self.use_response_cache = use_response_cache
+
+    async def run_item(self, item: BatchItem) -> BatchResult:
+        # Cada item corre en su propia task, así el contador de tokens no se mezcla con los demás
+        usage = {}
+        llm_usage.set(usage)
+        expected = item.expected_intent.value if item.expected_intent is not None else None
+        response, error = None, None
+        async with self.slot():
+            # La latencia se mide desde que el item tiene lugar, sin la espera por el cupo
+            start = time.perf_counter()
+            try:
+                async with asyncio.timeout(self.item_deadline):
+                    response = await self.dialogue_manager.get_response_async(
+                        item.chat_history, use_cache=self.use_response_cache,
+                    )
+            except TimeoutError:
+                error = "504: deadline exceeded"
+            except HTTPException as he:
+                error = f"{he.status_code}: {he.detail}"
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+            latency = time.perf_counter() - start
+
+        intent = response.intent.value if response is not None else None
+        return BatchResult(
+            id=item.id,
+            intent=intent,
+            expected_intent=expected,
+            correct=(intent == expected) if expected is not None and response is not None else None,
+            bot_msg=response.bot_msg if response is not None else None,
+            is_ticket_closed=response.is_ticket_closed if response is not None else None,
+            latency_s=round(latency, 4),
+            prompt_tokens=sum(p for p, _ in usage.values()),
+            response_tokens=sum(r for _, r in usage.values()),
+            cost_usd=sum(estimate_cost(model, p, r) for model, (p, r) in usage.items()),
+            error=error,
+        )
+
+    async def run(self, items: Iterable[BatchItem], on_result=None) -> tuple[list[BatchResult], dict]:
+        items = list(items)
+        ids = {item.id for item in items}
+        # Del checkpoint solo cuentan los items de esta corrida
+        done = self.checkpoint.load() if self.checkpoint is not None else {}
+        done = {id: r for id, r in done.items() if id in ids}
+        results = list(done.values())
+        pending = iter([item for item in items if item.id not in done])
+        processed = 0
+
+        async def worker():
+            nonlocal processed
+            # Workers fijos tomando del mismo iterador: la concurrencia queda acotada sin crear una task por item
+            for item in pending:
+                result = await asyncio.create_task(self.run_item(item))
+                results.append(result)
+                processed += 1
+                if self.checkpoint is not None:
+                    self.checkpoint.write(result)
+                if on_result is not None:
+                    on_result(result)
+
+        start = time.perf_counter()
+        try:
+            await asyncio.gather(*(worker() for _ in range(self.concurrency)))
+        finally:
+            if self.checkpoint is not None:
+                self.checkpoint.close()
+        return results, summarize_results(results, time.perf_counter() - start, processed)
@@ -0,0 +1,219 @@
+import bisect
+import contextvars
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Duración de cada etapa del request en curso, para logs y benchmarks
+stage_times: contextvars.ContextVar[dict | None] = contextvars.ContextVar("stage_times", default=None)
+# Tokens por modelo del request en curso: {model: [prompt_tokens, response_tokens]}
+llm_usage: contextvars.ContextVar[dict | None] = contextvars.ContextVar("llm_usage", default=None)
+
+# USD por millón de tokens (prompt, respuesta), precios de lista para prompts de hasta 128k tokens
+LLM_PRICES_PER_MTOK = {
+    "gemini-1.5-pro": (1.25, 5.00),
+    "gemini-1.5-flash": (0.075, 0.30),
+}
+
+
+def _escape_label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: tuple[tuple[str, str], ...]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape_label(v)}"' for k, v in labels) + "}"
+
+
+def percentile(values, pct: float) -> float:
+    # Percentil por rango más cercano sobre muestras crudas; 0 si no hay muestras
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))]
+
+
+# ---------------- Metrics ----------------
+class Counter:
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self._values: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in self._values.items():
+                lines.append(f"{self.name}{_format_labels(key)} {value}")
+        return lines
+
+
+class Gauge:
+    def __init__(self, name: str, help: str, fn: Callable[[], float] | None = None):
+        self.name = name
+        self.help = help
+        self.fn = fn
+        self.value = 0.0
+
+    def set(self, value: float):
+        self.value = value
+
+    def render(self) -> list[str]:
+        value = self.fn() if self.fn is not None else self.value
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge", f"{self.name} {value}"]
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        self._series: dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # [conteo por bucket..., +Inf, suma]
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[bisect.bisect_left(self.buckets, value)] += 1
+            series[-1] += value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in self._series.items():
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), series[:-1]):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f"{self.name}_bucket{_format_labels(key + (('le', le),))} {cumulative}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {series[-1]}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: dict[str, Counter | Gauge | Histogram] = {}
+
+    def counter(self, name: str, help: str) -> Counter:
+        return self._metrics.setdefault(name, Counter(name, help))
+
+    def gauge(self, name: str, help: str, fn: Callable[[], float] | None = None) -> Gauge:
+        gauge = self._metrics.setdefault(name, Gauge(name, help, fn))
+        if fn is not None:
+            gauge.fn = fn
+        return gauge
+
+    def histogram(self, name: str, help: str, buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._metrics.setdefault(name, Histogram(name, help, buckets))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+stage_duration = registry.histogram("hservice_stage_duration_seconds", "Duration of each chat pipeline stage.")
+request_duration = registry.histogram("hservice_request_duration_seconds", "HTTP request duration by route.")
+llm_prompt_tokens = registry.counter("hservice_llm_prompt_tokens_total", "Prompt tokens sent to the LLM.")
+llm_response_tokens = registry.counter("hservice_llm_response_tokens_total", "Response tokens generated by the LLM.")
+llm_cost = registry.counter("hservice_llm_cost_usd_total", "Estimated LLM spend in USD.")
+llm_tokens_per_call = registry.histogram(
+    "hservice_llm_tokens_per_call", "Prompt and response tokens per LLM call.",
+    buckets=(100, 250, 500, 1000, 2000, 4000, 8000, 16000, 32000),
+)
+
+
+# ---------------- Structured logging ----------------
+class JSONFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "event": record.getMessage(),
+        }
+        entry.update(getattr(record, "fields", {}))
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def configure_logging(level: str = "INFO"):
+    handler = logging.StreamHandler()
+    handler.setFormatter(JSONFormatter())
+    logger = logging.getLogger("HService")
+    logger.handlers[:] = [handler]
+    logger.setLevel(level)
+    logger.propagate = False
+
+
+def log_event(logger: logging.Logger, event: str, level: int = logging.INFO, **fields):
+    logger.log(level, event, extra={"fields": fields})
+
+
+@contextmanager
+def span(stage: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        stage_duration.observe(elapsed, stage=stage)
+        times = stage_times.get()
+        if times is not None:
+            times[stage] = times.get(stage, 0.0) + elapsed
+
+
+def estimate_cost(model: str, prompt_tokens: int, response_tokens: int) -> float:
+    prompt_price, response_price = LLM_PRICES_PER_MTOK.get(model, (0.0, 0.0))
+    return (prompt_tokens * prompt_price + response_tokens * response_price) / 1_000_000
+
+
+def record_llm_usage(model: str, prompt_tokens: int, response_tokens: int):
+    llm_prompt_tokens.inc(prompt_tokens, model=model)
+    llm_response_tokens.inc(response_tokens, model=model)
+    llm_cost.inc(estimate_cost(model, prompt_tokens, response_tokens), model=model)
+    llm_tokens_per_call.observe(prompt_tokens, kind="prompt")
+    llm_tokens_per_call.observe(response_tokens, kind="response")
+    usage = llm_usage.get()
+    if usage is not None:
+        totals = usage.setdefault(model, [0, 0])
+        totals[0] += prompt_tokens
+        totals[1] += response_tokens
+
+
+@contextmanager
+def track_llm_usage():
+    # Tokens por modelo de un bloque; al salir se suman también al contador del request que lo contiene
+    outer = llm_usage.get()
+    usage = {}
+    token = llm_usage.set(usage)
+    try:
+        yield usage
+    finally:
+        llm_usage.reset(token)
+        if outer is not None:
+            for model, (prompt_tokens, response_tokens) in usage.items():
+                totals = outer.setdefault(model, [0, 0])
+                totals[0] += prompt_tokens
+                totals[1] += response_tokens
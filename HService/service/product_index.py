@@ -0,0 +1,123 @@
+import heapq
+import math
+import re
+import sys
+import unicodedata
+from collections import Counter
+from typing import Iterable
+
+from HService.domain.models import Product
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_STOPWORDS = {
+    "de", "la", "el", "en", "y", "a", "los", "las", "un", "una", "con", "por", "para", "del",
+    "al", "que", "se", "su", "sus", "o", "es", "lo", "mi", "me", "tu", "te", "hay", "tienen",
+    "tenes", "quiero", "busco", "hola", "the", "and", "for", "with", "of",
+}
+
+
+def tokenize(text: str) -> list[str]:
+    # Sin acentos ni mayúsculas y con un stemming mínimo de plurales ("mouses" -> "mouse")
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    tokens = []
+    for token in _TOKEN_RE.findall(text):
+        if token in _STOPWORDS:
+            continue
+        if len(token) > 3 and token.endswith("s"):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+# ---------------- BM25 Index ----------------
+class ProductIndex:
+    """Índice BM25 de nombre y descripción de los productos.
+
+    Una vez publicado en un CatalogSnapshot no se modifica: la búsqueda no toma locks y nunca
+    espera a una recarga. Para actualizarlo se usa copy() y se sincroniza la copia.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._postings: dict[str, dict[int, int]] = {}
+        self._doc_terms: dict[int, Counter] = {}
+        self._doc_len: dict[int, int] = {}
+        # Hash de (nombre, descripción) por producto: detecta cambios sin guardar otra copia del texto
+        self._signatures: dict[int, int] = {}
+        self._total_len = 0
+
+    def __len__(self) -> int:
+        return len(self._doc_len)
+
+    def copy(self) -> "ProductIndex":
+        # Copia lo mutable; los Counter de cada documento no se modifican nunca y se comparten
+        index = ProductIndex(self.k1, self.b)
+        index._postings = {term: dict(postings) for term, postings in self._postings.items()}
+        index._doc_terms = dict(self._doc_terms)
+        index._doc_len = dict(self._doc_len)
+        index._signatures = dict(self._signatures)
+        index._total_len = self._total_len
+        return index
+
+    def sync(self, products: Iterable[Product]) -> int:
+        return self.sync_rows((p.id, p.name, p.description) for p in products)
+
+    def sync_rows(self, rows: Iterable[tuple[int, str, str]]) -> int:
+        # Reindexa solo los productos nuevos o modificados y borra los que ya no están.
+        # rows: (id, nombre, descripción), p. ej. leídos de las columnas del catálogo
+        changed = 0
+        current_ids = set()
+        for product_id, name, description in rows:
+            current_ids.add(product_id)
+            signature = hash((name, description))
+            if self._signatures.get(product_id) == signature:
+                continue
+            self._remove(product_id)
+            self._add(product_id, name, description, signature)
+            changed += 1
+        for product_id in [i for i in self._doc_len if i not in current_ids]:
+            self._remove(product_id)
+            changed += 1
+        return changed
+
+    def search(self, query: str, k: int) -> list[int]:
+        terms = Counter(tokenize(query))
+        n_docs = len(self._doc_len)
+        if not terms or n_docs == 0:
+            return []
+        avg_len = self._total_len / n_docs
+        scores: dict[int, float] = {}
+        for term in terms:
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+            for product_id, tf in postings.items():
+                norm = self.k1 * (1 - self.b + self.b * self._doc_len[product_id] / avg_len)
+                scores[product_id] = scores.get(product_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+        return heapq.nlargest(k, scores, key=scores.__getitem__)
+
+    def _add(self, product_id: int, name: str, description: str, signature: int):
+        # El nombre pesa el doble que la descripción. Términos internados: todos los documentos y las
+        # postings comparten un mismo string por término
+        terms = Counter(map(sys.intern, tokenize(name) * 2 + tokenize(description)))
+        for term, tf in terms.items():
+            self._postings.setdefault(term, {})[product_id] = tf
+        self._doc_terms[product_id] = terms
+        self._doc_len[product_id] = sum(terms.values())
+        self._signatures[product_id] = signature
+        self._total_len += self._doc_len[product_id]
+
+    def _remove(self, product_id: int):
+        terms = self._doc_terms.pop(product_id, None)
+        if terms is None:
+            return
+        for term in terms:
+            postings = self._postings[term]
+            del postings[product_id]
+            if not postings:
+                del self._postings[term]
+        self._total_len -= self._doc_len.pop(product_id)
+        del self._signatures[product_id]
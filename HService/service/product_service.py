@@ -1,8 +1,197 @@
-from database.mysql_product_repository import fetch_all_products, fetch_product_by_name
-from HService.domain.dialogue_manager import Product
+import asyncio
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass, replace
+from typing import Callable
+
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from database.arrow_catalog_repository import CATALOG_SNAPSHOT_DIR, ArrowCatalogSource, products_to_table, table_to_products
+from database.mysql_product_repository import fetch_all_products
+from HService.domain.models import Product
+from HService.service.product_index import ProductIndex
+
+CATALOG_TTL_SECONDS = float(os.getenv("CATALOG_TTL_SECONDS", "300"))
+# Cantidad máxima de productos que se inyectan en el prompt por turno
+PRODUCT_TOP_K = int(os.getenv("PRODUCT_TOP_K", "8"))
+# Con snapshot Arrow, revisar si hay una versión nueva es leer un archivo chico: se hace seguido
+CATALOG_SNAPSHOT_POLL_SECONDS = float(os.getenv("CATALOG_SNAPSHOT_POLL_SECONDS", "5"))
+_DISCOUNT_QUERY_RE = re.compile(r"descuento|oferta|promo|rebaja|liquidaci|discount", re.IGNORECASE)
+
+
+def render_product_line(p: Product) -> str:
+    return f"- {p.name}: {p.description}. Precio: ${p.price}. Stock: {'Sí' if p.in_stock else 'No'}. Descuento: {p.discount_percent}%."
+
+def render_product_info(products: list[Product]) -> str:
+    return "\n".join(render_product_line(p) for p in products)
+
+
+# ---------------- Catalog Cache ----------------
+@dataclass(frozen=True)
+class CatalogSnapshot:
+    # Columnas del catálogo. Con snapshot Arrow apuntan al archivo mapeado, que comparten todos los workers:
+    # cada worker solo guarda el índice BM25 y el mapa de ids, y arma los Product de las filas que usa
+    table: pa.Table
+    # id -> número de fila en table
+    rows: dict[int, int]
+    index: ProductIndex
+    version: int
+    loaded_at: float
+
+    def __len__(self) -> int:
+        return self.table.num_rows
+
+    def products(self, product_ids: list[int] | None = None) -> list[Product]:
+        # Los productos pedidos, en ese orden; sin ids, el catálogo entero
+        table = self.table if product_ids is None else self.table.take([self.rows[i] for i in product_ids])
+        return table_to_products(table)
+
+
+class ProductCatalogCache:
+    def __init__(self, loader: Callable[[], list[Product] | pa.Table], ttl: float = CATALOG_TTL_SECONDS):
+        self.loader = loader
+        self.ttl = ttl
+        self._snapshot: CatalogSnapshot | None = None
+        self._version = 0
+        # Un solo thread recarga el catálogo; el resto espera y reutiliza el resultado
+        self._refresh_lock = threading.Lock()
+
+    def get(self) -> CatalogSnapshot:
+        snapshot = self._snapshot
+        if snapshot is not None and not self._is_expired(snapshot):
+            return snapshot
+
+        with self._refresh_lock:
+            snapshot = self._snapshot
+            if snapshot is not None and not self._is_expired(snapshot):
+                return snapshot
+            return self._refresh()
+
+    async def get_async(self) -> CatalogSnapshot:
+        snapshot = self._snapshot
+        if snapshot is not None and not self._is_expired(snapshot):
+            return snapshot
+        return await asyncio.to_thread(self.get)
+
+    def invalidate(self):
+        # Marcamos el snapshot como vencido sin descartarlo, así la versión solo cambia si cambian los datos
+        snapshot = self._snapshot
+        if snapshot is not None:
+            self._snapshot = replace(snapshot, loaded_at=float("-inf"))
+
+    def _is_expired(self, snapshot: CatalogSnapshot) -> bool:
+        return time.monotonic() - snapshot.loaded_at >= self.ttl
+
+    def _refresh(self) -> CatalogSnapshot:
+        loaded = self.loader()
+        previous = self._snapshot
+        if isinstance(loaded, pa.Table):
+            if previous is not None and loaded is previous.table:
+                # Misma versión del snapshot Arrow: solo se renueva el TTL
+                self._snapshot = replace(previous, loaded_at=time.monotonic())
+                return self._snapshot
+            table = loaded
+        else:
+            # La lista que devuelve el loader pasa a columnas y se descarta
+            table = products_to_table(loaded)
+
+        if previous is not None and table.equals(previous.table):
+            # Mismos datos: se conservan la versión, el índice y el mapa de filas
+            rows, index = previous.rows, previous.index
+        else:
+            self._version += 1
+            # Copy-on-write: el índice nuevo se arma al lado del publicado, que sigue atendiendo búsquedas
+            # sin esperar a la recarga. Las listas de Python son temporales: el índice guarda términos
+            ids, names, descriptions = (table.column(c).to_pylist() for c in ("id", "name", "description"))
+            index = previous.index.copy() if previous is not None else ProductIndex()
+            index.sync_rows(zip(ids, names, descriptions))
+            rows = {product_id: row for row, product_id in enumerate(ids)}
+
+        self._snapshot = CatalogSnapshot(
+            table=table,
+            rows=rows,
+            index=index,
+            version=self._version,
+            loaded_at=time.monotonic(),
+        )
+        return self._snapshot
+
+
+def _default_catalog_cache() -> ProductCatalogCache:
+    if CATALOG_SNAPSHOT_DIR:
+        # Los workers comparten el snapshot exportado por scripts.export_catalog_snapshot en vez de consultar MySQL
+        return ProductCatalogCache(ArrowCatalogSource(CATALOG_SNAPSHOT_DIR), ttl=CATALOG_SNAPSHOT_POLL_SECONDS)
+    return ProductCatalogCache(fetch_all_products)
+
+
+catalog_cache = _default_catalog_cache()
+
+
+def get_catalog() -> CatalogSnapshot:
+    return catalog_cache.get()
+
+async def get_catalog_async() -> CatalogSnapshot:
+    return await catalog_cache.get_async()
+
+def invalidate_catalog():
+    catalog_cache.invalidate()
+
+def find_product(snapshot: CatalogSnapshot, name: str) -> Product | None:
+    # Exacto, después prefijo y por último subcadena, sin distinguir mayúsculas (como get_mock_product_by_name).
+    # Vectorizado sobre la columna de nombres; gana la primera fila que coincide
+    names = snapshot.table["name"]
+    for mask in (
+        lambda: pc.equal(pc.utf8_lower(names), name.lower()),
+        lambda: pc.starts_with(names, name, ignore_case=True),
+        lambda: pc.match_substring(names, name, ignore_case=True),
+    ):
+        row = pc.index(mask(), True).as_py()
+        if row >= 0:
+            return table_to_products(snapshot.table.slice(row, 1))[0]
+    return None
 
 def get_all_products() -> list[Product]:
-    return fetch_all_products()
+    return get_catalog().products()
 
 def get_product_by_name(name: str) -> Product | None:
-    return fetch_product_by_name(name)
\ No newline at end of file
+    return find_product(get_catalog(), name)
+
+def filter_product_ids(
+    snapshot: CatalogSnapshot, in_stock: bool | None = None, discounted: bool = False, limit: int | None = None,
+) -> list[int]:
+    # Filtro vectorizado sobre las columnas Arrow; de mayor a menor descuento
+    table = snapshot.table
+    mask = pc.greater(table["discount_percent"], 0) if discounted else None
+    if in_stock is not None:
+        stock = pc.equal(table["in_stock"], in_stock)
+        mask = stock if mask is None else pc.and_(mask, stock)
+    if mask is not None:
+        table = table.filter(mask)
+    order = pc.sort_indices(table, sort_keys=[("discount_percent", "descending"), ("id", "ascending")])
+    if limit is not None:
+        order = order[:limit]
+    return table["id"].take(order).to_pylist()
+
+def select_product_info(snapshot: CatalogSnapshot, query: str, k: int = PRODUCT_TOP_K) -> str:
+    # Catálogos chicos van completos; en los grandes solo entran los top-k por BM25
+    if len(snapshot) <= k:
+        return render_product_info(snapshot.products())
+
+    if _DISCOUNT_QUERY_RE.search(query):
+        # "¿Qué ofertas tienen?": los relevantes con descuento y en stock, completados con los de mayor descuento
+        discounted = filter_product_ids(snapshot, in_stock=True, discounted=True)
+        allowed = set(discounted)
+        product_ids = [i for i in snapshot.index.search(query, k * 4) if i in allowed][:k]
+        product_ids += [i for i in discounted if i not in product_ids][:k - len(product_ids)]
+    else:
+        product_ids = [i for i in snapshot.index.search(query, k) if i in snapshot.rows]
+    if not product_ids:
+        # Sin coincidencias, mejor mostrar productos disponibles que los primeros del catálogo
+        product_ids = filter_product_ids(snapshot, in_stock=True, limit=k) or snapshot.table["id"][:k].to_pylist()
+    # Solo se renderizan las líneas que entran al prompt
+    lines = [render_product_line(p) for p in snapshot.products(product_ids)]
+    lines.append(f"(Se muestran solo los {len(lines)} productos más relevantes de un catálogo de {len(snapshot)}.)")
+    return "\n".join(lines)
@@ -0,0 +1,98 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import xxhash
+
+from HService.domain.models import Intent, Message, Response
+from HService.domain.text import normalize_text
+
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "1") == "1"
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1024"))
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "3600"))
+# Solo conversaciones cortas (las preguntas frecuentes de apertura) se buscan y se guardan
+RESPONSE_CACHE_MAX_HISTORY = int(os.getenv("RESPONSE_CACHE_MAX_HISTORY", "4"))
+
+# Flujos que dependen de la cuenta o el pedido del usuario: nunca se reutiliza la respuesta
+ACCOUNT_SPECIFIC_INTENTS = frozenset({
+    Intent.create_account, Intent.delete_account, Intent.edit_account, Intent.recover_password,
+    Intent.registration_problems, Intent.switch_account, Intent.complaint, Intent.review,
+    Intent.check_invoice, Intent.get_invoice, Intent.cancel_order, Intent.change_order,
+    Intent.place_order, Intent.track_order, Intent.payment_issue, Intent.get_refund,
+    Intent.track_refund, Intent.change_shipping_address, Intent.set_up_shipping_address,
+    Intent.contact_human_agent,
+})
+
+
+def _disabled_intents_from_env() -> frozenset[Intent]:
+    value = os.getenv("RESPONSE_CACHE_DISABLED_INTENTS")
+    if value is None:
+        return ACCOUNT_SPECIFIC_INTENTS
+    return frozenset(Intent(name.strip()) for name in value.split(",") if name.strip())
+
+
+# ---------------- Response Cache ----------------
+class ResponseCache:
+    def __init__(
+        self,
+        max_entries: int = RESPONSE_CACHE_MAX_ENTRIES,
+        ttl: float = RESPONSE_CACHE_TTL_SECONDS,
+        max_history: int = RESPONSE_CACHE_MAX_HISTORY,
+        disabled_intents: frozenset[Intent] | None = None,
+        enabled: bool = RESPONSE_CACHE_ENABLED,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_history = max_history
+        self.disabled_intents = _disabled_intents_from_env() if disabled_intents is None else disabled_intents
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, tuple[Response, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def make_key(self, chat_history: list[Message], catalog_version: int, model_name: str = "") -> str | None:
+        if not self.enabled or len(chat_history) > self.max_history:
+            return None
+        h = xxhash.xxh3_128()
+        h.update(f"{model_name}\0{catalog_version}\0")
+        for msg in chat_history:
+            h.update(f"{msg.role}\0{normalize_text(msg.content)}\0")
+        return h.hexdigest()
+
+    def get(self, key: str | None) -> Response | None:
+        if key is None:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() >= entry[1]:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: str | None, response: Response):
+        if key is None or response.intent in self.disabled_intents:
+            return
+        with self._lock:
+            self._entries[key] = (response, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,108 @@
+import asyncio
+import os
+import time
+import uuid
+from collections import OrderedDict
+from typing import Callable
+
+from HService.domain.models import Message
+
+SESSION_IDLE_TTL_SECONDS = float(os.getenv("SESSION_IDLE_TTL_SECONDS", "1800"))
+SESSION_MAX_COUNT = int(os.getenv("SESSION_MAX_COUNT", "10000"))
+# Tope aproximado de memoria para todos los historiales (suma de caracteres guardados)
+SESSION_MAX_CHARS = int(os.getenv("SESSION_MAX_CHARS", str(50_000_000)))
+
+
+class ChatSession:
+    def __init__(self, session_id: str, history: list[Message] | None = None):
+        self.session_id = session_id
+        self.history: list[Message] = list(history or [])
+        self.size = sum(len(m.content) for m in self.history)
+        self.last_access = time.monotonic()
+        # Serializa los turnos de una misma sesión para no mezclar historiales
+        self.lock = asyncio.Lock()
+        # Del último turno, para el transcript que se guarda al cerrar
+        self.intent: str | None = None
+        self.is_ticket_closed = False
+        # Mensajes ya guardados: cada transcript lleva solo los posteriores. El historial inicial de una
+        # sesión retomada ya se guardó con la sesión anterior al expirar, así no se duplica
+        self.persisted_messages = len(self.history)
+
+    def append(self, message: Message):
+        self.history.append(message)
+        self.size += len(message.content)
+
+
+# ---------------- Session Store ----------------
+class SessionStore:
+    def __init__(
+        self,
+        idle_ttl: float = SESSION_IDLE_TTL_SECONDS,
+        max_sessions: int = SESSION_MAX_COUNT,
+        max_chars: int = SESSION_MAX_CHARS,
+        on_evict: Callable[[ChatSession, str], None] | None = None,
+    ):
+        self.idle_ttl = idle_ttl
+        self.max_sessions = max_sessions
+        self.max_chars = max_chars
+        # Se llama con cada sesión que el store descarta por su cuenta y el motivo, p. ej. para guardar su transcript
+        self.on_evict = on_evict
+        # Ordenado por último acceso: el primero es el candidato a desalojar
+        self._sessions: OrderedDict[str, ChatSession] = OrderedDict()
+        self._total_chars = 0
+
+    def create(self, history: list[Message] | None = None) -> ChatSession:
+        session = ChatSession(uuid.uuid4().hex, history)
+        self._sessions[session.session_id] = session
+        self._total_chars += session.size
+        self._evict()
+        return session
+
+    def get(self, session_id: str) -> ChatSession | None:
+        self._evict_idle()
+        session = self._sessions.get(session_id)
+        if session is None:
+            return None
+        session.last_access = time.monotonic()
+        self._sessions.move_to_end(session_id)
+        return session
+
+    def append(self, session: ChatSession, message: Message):
+        session.append(message)
+        if session.session_id in self._sessions:
+            self._total_chars += len(message.content)
+            self._evict()
+
+    def delete(self, session_id: str) -> ChatSession | None:
+        session = self._sessions.pop(session_id, None)
+        if session is not None:
+            self._total_chars -= session.size
+        return session
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def close(self):
+        # Al apagar el worker: las sesiones vivas se descartan como si hubieran expirado
+        while self._sessions:
+            self._discard(next(iter(self._sessions)), "shutdown")
+
+    def _evict(self):
+        self._evict_idle()
+        while self._sessions and (
+            len(self._sessions) > self.max_sessions or self._total_chars > self.max_chars
+        ):
+            self._discard(next(iter(self._sessions)), "evicted")
+
+    def _evict_idle(self):
+        now = time.monotonic()
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if now - session.last_access < self.idle_ttl:
+                break
+            self._discard(session.session_id, "idle_expired")
+
+    def _discard(self, session_id: str, reason: str):
+        session = self.delete(session_id)
+        if session is not None and self.on_evict is not None:
+            self.on_evict(session, reason)
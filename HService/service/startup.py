@@ -0,0 +1,85 @@
+import asyncio
+import logging
+import os
+import time
+
+from fastapi import HTTPException
+
+from HService.service.observability import log_event
+
+logger = logging.getLogger(__name__)
+
+# Llamada corta a cada proveedor al arrancar; cuesta unos pocos tokens por worker
+STARTUP_LLM_WARMUP = os.getenv("STARTUP_LLM_WARMUP", "1") == "1"
+STARTUP_RETRY_AFTER = int(os.getenv("STARTUP_RETRY_AFTER", "2"))
+
+
+# ---------------- Service State ----------------
+class ServiceState:
+    """Inicialización diferida del servicio.
+
+    El DialogueManager (y con él los SDK de los proveedores, el clasificador local y el catálogo)
+    se crea en el lifespan de la app y no al importar el módulo: el worker responde /healthz
+    apenas arranca y /readyz recién cuando termina el warm-up. Hasta entonces, o si falta
+    configuración como la API key, las rutas de chat responden 503.
+    """
+
+    def __init__(self, started_at: float):
+        # perf_counter del momento en que se empezó a importar la app
+        self.started_at = started_at
+        self.dialogue_manager = None
+        self.ready = False
+        self.error: str | None = None
+        self.timings: dict[str, float] = {}
+        self.warmup_errors: dict[str, str] = {}
+
+    async def start(self, llm=None, fast_llm=None, warm_up_llm: bool = STARTUP_LLM_WARMUP):
+        self.timings["import"] = time.perf_counter() - self.started_at
+        start = time.perf_counter()
+        try:
+            # Import diferido: trae numpy, el conector de MySQL y, al crear los proveedores, sus SDK
+            from HService.domain.dialogue_manager import DialogueManager
+            # En un thread, así el loop sigue respondiendo /healthz mientras tanto
+            dialogue_manager = await asyncio.to_thread(DialogueManager, llm, fast_llm)
+        except Exception as e:
+            self.error = f"{type(e).__name__}: {e}"
+            log_event(logger, "startup_failed", logging.ERROR, error=self.error)
+            return
+        finally:
+            self.timings["init"] = time.perf_counter() - start
+
+        warmup, self.warmup_errors = await dialogue_manager.warm_up_async(llm=warm_up_llm)
+        self.timings.update({f"warmup_{name}": seconds for name, seconds in warmup.items()})
+        self.timings["cold_start"] = time.perf_counter() - self.started_at
+        self.dialogue_manager = dialogue_manager
+        self.ready = True
+        log_event(
+            logger, "startup_complete",
+            timings_ms={k: round(v * 1000, 1) for k, v in self.timings.items()}, warmup_errors=self.warmup_errors,
+        )
+
+    def require(self):
+        # DialogueManager listo para atender o 503: el cliente reintenta en vez de esperar un arranque en frío
+        if self.ready:
+            return self.dialogue_manager
+        if self.error is not None:
+            raise HTTPException(status_code=503, detail="The assistant is not available.")
+        raise HTTPException(
+            status_code=503,
+            detail="The assistant is starting. Please try again shortly.",
+            headers={"Retry-After": str(STARTUP_RETRY_AFTER)},
+        )
+
+    def status(self) -> dict:
+        if self.ready:
+            state = "ready"
+        elif self.error is not None:
+            state = "unavailable"
+        else:
+            state = "starting"
+        return {
+            "status": state,
+            "error": self.error,
+            "startup_ms": {k: round(v * 1000, 1) for k, v in self.timings.items()},
+            "warmup_errors": self.warmup_errors,
+        }
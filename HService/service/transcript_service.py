@@ -0,0 +1,176 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+
+from HService.domain.models import Message
+from HService.service.observability import log_event, registry
+
+logger = logging.getLogger(__name__)
+
+TRANSCRIPTS_ENABLED = os.getenv("TRANSCRIPTS_ENABLED", "1") == "1"
+TRANSCRIPT_QUEUE_SIZE = int(os.getenv("TRANSCRIPT_QUEUE_SIZE", "10000"))
+TRANSCRIPT_BATCH_SIZE = int(os.getenv("TRANSCRIPT_BATCH_SIZE", "100"))
+# Tiempo máximo que un transcript espera en memoria antes de escribirse
+TRANSCRIPT_FLUSH_INTERVAL = float(os.getenv("TRANSCRIPT_FLUSH_INTERVAL", "2"))
+TRANSCRIPT_MAX_ATTEMPTS = int(os.getenv("TRANSCRIPT_MAX_ATTEMPTS", "3"))
+TRANSCRIPT_DRAIN_TIMEOUT = float(os.getenv("TRANSCRIPT_DRAIN_TIMEOUT", "10"))
+
+transcripts_enqueued = registry.counter("hservice_transcripts_enqueued_total", "Transcripts queued for persistence.")
+transcripts_written = registry.counter("hservice_transcripts_written_total", "Transcripts written to the database.")
+transcripts_dropped = registry.counter("hservice_transcripts_dropped_total", "Transcripts lost, by reason.")
+transcript_flush_duration = registry.histogram("hservice_transcript_flush_seconds", "Duration of each batched transcript insert.")
+
+
+@dataclass
+class TranscriptRecord:
+    session_id: str | None
+    # Los mensajes de la sesión desde su transcript anterior, si lo hubo
+    messages: list[Message]
+    intent: str | None
+    is_ticket_closed: bool
+    # "ticket_closed" si lo cerró el LLM, "session_ended" si el cliente terminó la sesión; "idle_expired",
+    # "evicted" o "shutdown" si la sesión se descartó sin que nadie la cerrara
+    close_reason: str
+    closed_at: float
+
+    def to_row(self) -> tuple:
+        return (
+            self.session_id,
+            self.intent,
+            self.is_ticket_closed,
+            self.close_reason,
+            len(self.messages),
+            json.dumps([{"sender": m.role, "msg": m.content} for m in self.messages], ensure_ascii=False),
+            datetime.fromtimestamp(self.closed_at, tz=timezone.utc).replace(tzinfo=None),
+        )
+
+
+def _insert_transcripts(rows: list[tuple]):
+    # Import diferido: el conector de MySQL se carga recién en el primer flush
+    from database.mysql_transcript_repository import insert_transcripts
+    insert_transcripts(rows)
+
+
+# ---------------- Transcript Writer ----------------
+class TranscriptWriter:
+    """Persistencia write-behind de transcripts.
+
+    submit nunca espera: encola el registro y vuelve. Una task del loop junta lotes de hasta
+    batch_size registros, o lo que llegó en flush_interval, y los inserta con un executemany en
+    un thread. Si la cola se llena o la base no responde después de max_attempts, los registros
+    se descartan y se cuentan en hservice_transcripts_dropped_total: la latencia del chat no
+    depende de la base.
+    """
+
+    def __init__(
+        self,
+        write=_insert_transcripts,
+        batch_size: int = TRANSCRIPT_BATCH_SIZE,
+        flush_interval: float = TRANSCRIPT_FLUSH_INTERVAL,
+        max_queue: int = TRANSCRIPT_QUEUE_SIZE,
+        max_attempts: int = TRANSCRIPT_MAX_ATTEMPTS,
+        enabled: bool = TRANSCRIPTS_ENABLED,
+    ):
+        if batch_size < 1:
+            raise ValueError("Transcript batch size must be at least 1")
+        self.write = write
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self.max_attempts = max_attempts
+        self.enabled = enabled
+        # La cola se crea en start, dentro del loop que la va a usar
+        self._queue: asyncio.Queue | None = None
+        self._task: asyncio.Task | None = None
+
+    def start(self):
+        if not self.enabled or self._task is not None:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._task = asyncio.create_task(self._run())
+
+    def submit(self, record: TranscriptRecord) -> bool:
+        if self._task is None:
+            if self.enabled:
+                transcripts_dropped.inc(reason="not_running")
+            return False
+        try:
+            self._queue.put_nowait(record)
+        except asyncio.QueueFull:
+            transcripts_dropped.inc(reason="queue_full")
+            return False
+        transcripts_enqueued.inc()
+        return True
+
+    def depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def close(self, timeout: float = TRANSCRIPT_DRAIN_TIMEOUT):
+        # Al apagar: no se aceptan más registros y se escribe lo que quedó en la cola
+        if self._task is None:
+            return
+        task, self._task = self._task, None
+        try:
+            await asyncio.wait_for(self._drain(task), timeout)
+        except asyncio.TimeoutError:
+            lost = self._queue.qsize()
+            transcripts_dropped.inc(lost, reason="shutdown")
+            log_event(logger, "transcript_drain_timeout", logging.WARNING, lost=lost)
+
+    async def _drain(self, task: asyncio.Task):
+        # None marca el final: la task escribe el último lote y termina
+        await self._queue.put(None)
+        await task
+
+    async def _run(self):
+        while True:
+            record = await self._queue.get()
+            if record is None:
+                return
+            batch, closing = [record], False
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    record = self._queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        record = await asyncio.wait_for(self._queue.get(), remaining)
+                    except asyncio.TimeoutError:
+                        break
+                if record is None:
+                    closing = True
+                    break
+                batch.append(record)
+            await self._flush(batch)
+            if closing:
+                return
+
+    async def _flush(self, batch: list[TranscriptRecord]):
+        for attempt in range(1, self.max_attempts + 1):
+            start = time.perf_counter()
+            try:
+                # La serialización y el INSERT corren en un thread, fuera del loop que atiende el chat
+                await asyncio.to_thread(self._write_batch, batch)
+            except Exception as e:
+                log_event(
+                    logger, "transcript_flush_failed", logging.WARNING,
+                    attempt=attempt, records=len(batch), error=f"{type(e).__name__}: {e}",
+                )
+                if attempt == self.max_attempts:
+                    transcripts_dropped.inc(len(batch), reason="write_failed")
+                    return
+                await asyncio.sleep(min(0.5 * 2 ** attempt, 10))
+            else:
+                transcript_flush_duration.observe(time.perf_counter() - start)
+                transcripts_written.inc(len(batch))
+                return
+
+    def _write_batch(self, batch: list[TranscriptRecord]):
+        self.write([record.to_row() for record in batch])
@@ -0,0 +1,84 @@
+"""Catalog load cost and memory per worker: Arrow snapshot versus a product list from MySQL.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_catalog_snapshot --sizes 1000 10000 50000
+
+"map ms" opens the memory-mapped snapshot; "load ms" is a worker's first catalog load
+from the snapshot (index included) and "poll ms" the check it repeats while the version
+does not change. "heap MB" is the Python memory the worker keeps after loading (BM25 index
+and id map) and "arrow MB" the Arrow buffers it allocates: 0 for the snapshot, whose
+columns live in the shared page cache, versus the columns built from a product list as
+with MySQL. "products MB" is what holding every Product would cost instead. "filter ms"
+selects the discounted products in stock from the Arrow columns versus a Python loop.
+"""
+import argparse
+import gc
+import tempfile
+import time
+import tracemalloc
+
+import pyarrow as pa
+
+from benchmarks.bench_product_index import generate_catalog
+from database.arrow_catalog_repository import ArrowCatalogSource, read_catalog_snapshot, table_to_products, write_catalog_snapshot
+from HService.service.product_service import ProductCatalogCache, filter_product_ids
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, (time.perf_counter() - start) * 1000
+
+
+def retained(fn):
+    # Memoria de Python y de Arrow que sigue ocupada mientras se conserva el resultado de fn
+    gc.collect()
+    arrow_before = pa.total_allocated_bytes()
+    tracemalloc.start()
+    result = fn()
+    gc.collect()
+    heap, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, heap / 2**20, (pa.total_allocated_bytes() - arrow_before) / 2**20
+
+
+def run(size: int):
+    products = generate_catalog(size)
+    with tempfile.TemporaryDirectory() as directory:
+        write_catalog_snapshot(products, directory)
+        (_, table), map_ms = timed(lambda: read_catalog_snapshot(directory))
+        _, products_mb, _ = retained(lambda: table_to_products(table))
+
+        cache = ProductCatalogCache(ArrowCatalogSource(directory), ttl=0)
+        (snapshot, load_ms) = timed(cache.get)
+        _, poll_ms = timed(cache.get)
+        _, heap_mb, arrow_mb = retained(lambda: ProductCatalogCache(ArrowCatalogSource(directory)).get())
+        _, _, list_arrow_mb = retained(lambda: ProductCatalogCache(lambda: products).get())
+
+        _, filter_ms = timed(lambda: filter_product_ids(snapshot, in_stock=True, discounted=True))
+        _, loop_ms = timed(lambda: sorted(
+            (p for p in products if p.in_stock and p.discount_percent > 0),
+            key=lambda p: (-p.discount_percent, p.id),
+        ))
+    print(
+        f"{size:>8} | {map_ms:>6.2f} | {load_ms:>7.1f} | {poll_ms:>7.3f} | {heap_mb:>7.1f} | "
+        f"{arrow_mb:>5.1f} / {list_arrow_mb:<5.1f} | {products_mb:>11.1f} | {filter_ms:>9.2f} | {loop_ms:>7.2f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    args = parser.parse_args()
+
+    print(
+        f"{'products':>8} | {'map ms':>6} | {'load ms':>7} | {'poll ms':>7} | {'heap MB':>7} | "
+        f"{'arrow MB snap/list':>13} | {'products MB':>11} | {'filter ms':>9} | {'loop ms':>7}"
+    )
+    for size in args.sizes:
+        run(size)
+
+
+if __name__ == "__main__":
+    main()
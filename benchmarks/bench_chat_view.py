@@ -0,0 +1,161 @@
+"""ChatView rendering cost as a ticket grows to thousands of messages.
+
+Drives the view through a Flet page backed by an in-memory connection, so the
+numbers include the real control diffing done on every update() but not the
+Flutter client. Compares the bounded ListView against the previous unbounded
+Column that updated after every change.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_chat_view --messages 500 2000 5000
+"""
+import argparse
+import asyncio
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+import flet as ft
+from flet_core.pubsub.pubsub_hub import PubSubHub
+
+from HFlet.presentation.chat_view import CHAT_MAX_LIVE_MESSAGES, ChatView, MessageBubble
+
+REPLY = "¡Claro! Te cuento las opciones disponibles y cómo seguir con tu compra. " * 3
+
+
+class RecordingConnection:
+    # Conexión en memoria: asigna ids a los controles agregados y cuenta los comandos enviados
+    def __init__(self):
+        self.pubsubhub = PubSubHub()
+        self.next_id = 0
+        self.commands = 0
+        self.updates = 0
+
+    def send_commands(self, session_id, commands):
+        self.updates += 1
+        self.commands += len(commands)
+        results = []
+        for command in commands:
+            if command.name == "add":
+                ids = []
+                for _ in command.commands:
+                    self.next_id += 1
+                    ids.append(f"_{self.next_id}")
+                results.append(" ".join(ids))
+        return SimpleNamespace(results=results, error="")
+
+    def send_command(self, session_id, command):
+        return SimpleNamespace(result="", error="")
+
+
+class LegacyBubble(MessageBubble):
+    def is_isolated(self):
+        return False
+
+
+class LegacyChatView(ft.Container):
+    # El ChatView anterior: Column sin límite, spinner dentro de la lista y un update() por cambio
+    def __init__(self):
+        super().__init__()
+        self.chat_messages = ft.Column(scroll="auto", expand=True)
+        self.content = self.chat_messages
+
+    def display_user_message(self, message: str):
+        self.chat_messages.controls.append(LegacyBubble(message, is_user=True))
+        self.chat_messages.update()
+
+    def show_loading_indicator(self):
+        self.chat_messages.controls.append(ft.ProgressRing())
+        self.chat_messages.update()
+
+    def hide_loading_indicator(self):
+        if isinstance(self.chat_messages.controls[-1], ft.ProgressRing):
+            self.chat_messages.controls.pop()
+            self.chat_messages.update()
+
+    def start_bot_message(self) -> MessageBubble:
+        bubble = LegacyBubble("", is_user=False)
+        self.chat_messages.controls.append(bubble)
+        self.chat_messages.update()
+        return bubble
+
+
+def run_turns(view, messages: int, deltas: int, batched: bool):
+    chunk = len(REPLY) // deltas + 1
+    for i in range(messages // 2):
+        if batched:
+            with view.batch():
+                view.display_user_message(f"Mensaje del usuario número {i}")
+                view.show_loading_indicator()
+            with view.batch():
+                view.hide_loading_indicator()
+                bubble = view.start_bot_message()
+        else:
+            view.display_user_message(f"Mensaje del usuario número {i}")
+            view.show_loading_indicator()
+            view.hide_loading_indicator()
+            bubble = view.start_bot_message()
+        for start in range(0, len(REPLY), chunk):
+            bubble.append_text(REPLY[start:start + chunk])
+
+
+def measure(name: str, make_view, messages: int, deltas: int, batched: bool, memory: bool = False) -> dict:
+    conn = RecordingConnection()
+    page = ft.Page(conn, "bench", asyncio.new_event_loop())
+    view = make_view()
+    page.controls.append(view)
+    page.update()
+    conn.commands = conn.updates = 0
+
+    if memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    run_turns(view, messages, deltas, batched)
+    elapsed = time.perf_counter() - start
+    peak = 0
+    if memory:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    # Costo de un turno más con la conversación ya larga
+    turn_start = time.perf_counter()
+    run_turns(view, 2, deltas, batched)
+    last_turn = time.perf_counter() - turn_start
+
+    return {
+        "view": name,
+        "messages": messages,
+        "total_s": elapsed,
+        "last_turn_ms": last_turn * 1000,
+        "list_updates": conn.updates,
+        "live_controls": len(view.chat_messages.controls),
+        "page_index": len(page._index),
+        "peak_mb": peak / 1e6,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, nargs="+", default=[500, 2000, 5000])
+    parser.add_argument("--deltas", type=int, default=8, help="streamed chunks per bot reply")
+    parser.add_argument("--max-live", type=int, default=CHAT_MAX_LIVE_MESSAGES)
+    parser.add_argument("--legacy-max", type=int, default=500, help="skip the quadratic Column view above this size")
+    parser.add_argument("--memory", action="store_true", help="trace peak allocations (several times slower)")
+    args = parser.parse_args()
+
+    print(f"{'view':<10}{'messages':>10}{'total s':>10}{'last turn ms':>14}{'updates':>10}{'live':>8}{'indexed':>10}{'peak MB':>10}")
+    for messages in args.messages:
+        rows = []
+        if messages <= args.legacy_max:
+            rows.append(measure("column", LegacyChatView, messages, args.deltas, False, args.memory))
+        rows.append(measure(
+            "listview", lambda: ChatView(on_send=lambda _: None, max_live_messages=args.max_live),
+            messages, args.deltas, True, args.memory,
+        ))
+        for r in rows:
+            print(f"{r['view']:<10}{r['messages']:>10}{r['total_s']:>10.2f}{r['last_turn_ms']:>14.2f}"
+                  f"{r['list_updates']:>10}{r['live_controls']:>8}{r['page_index']:>10}{r['peak_mb']:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Prompt size and index cost as the catalog grows.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_product_index --sizes 100 1000 10000 50000
+"""
+import argparse
+import random
+import time
+
+from HService.domain.models import Product
+from HService.service.product_index import ProductIndex
+from HService.service.product_service import ProductCatalogCache, render_product_info, select_product_info
+
+BRANDS = ["Lenovo", "Logitech", "Samsung", "HP", "Asus", "Redragon", "Sony", "Xiaomi", "Kingston", "Dell"]
+KINDS = [
+    ("Notebook", "con {ram}GB RAM y SSD {ssd}GB"),
+    ("Mouse Gamer", "con sensor óptico de {dpi} DPI y luces RGB"),
+    ("Auriculares Bluetooth", "inalámbricos con cancelación de ruido y {hours} horas de batería"),
+    ("Teclado Mecánico", "switches {switch} y retroiluminación RGB"),
+    ("Monitor", "de {inches} pulgadas Full HD"),
+    ("Pendrive", "USB 3.0 de {ssd}GB"),
+]
+QUERIES = [
+    "hola, busco una notebook con 16GB de RAM",
+    "tienen auriculares bluetooth con cancelación de ruido?",
+    "quiero un teclado mecánico con switches rojos",
+    "me interesa un monitor de 27 pulgadas",
+]
+
+
+def generate_catalog(size: int, seed: int = 0) -> list[Product]:
+    rng = random.Random(seed)
+    products = []
+    for i in range(1, size + 1):
+        kind, description = rng.choice(KINDS)
+        products.append(Product(
+            id=i,
+            name=f"{kind} {rng.choice(BRANDS)} {rng.randint(100, 999)}",
+            description=description.format(
+                ram=rng.choice([8, 16, 32]), ssd=rng.choice([128, 256, 512]), dpi=rng.choice([800, 3200, 16000]),
+                hours=rng.randint(10, 60), switch=rng.choice(["rojos", "azules", "marrones"]), inches=rng.choice([22, 24, 27]),
+            ),
+            price=rng.randint(5_000, 900_000),
+            in_stock=rng.random() > 0.2,
+            discount_percent=rng.choice([0, 5, 10, 15]),
+        ))
+    return products
+
+
+def run(size: int, k: int):
+    products = generate_catalog(size)
+    cache = ProductCatalogCache(lambda: products)
+
+    start = time.perf_counter()
+    snapshot = cache.get()
+    build_s = time.perf_counter() - start
+
+    # Cambia el 1% del catálogo para medir la actualización incremental del índice
+    changed = [p.model_copy(update={"description": p.description + " edición 2025"}) for p in products[: max(1, size // 100)]]
+    updated = changed + products[len(changed):]
+    index = ProductIndex()
+    index.sync(products)
+    # Como en una recarga: copia del índice publicado y sincronización de la copia
+    start = time.perf_counter()
+    index.copy().sync(updated)
+    sync_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    selected = [select_product_info(snapshot, q, k) for q in QUERIES]
+    query_s = (time.perf_counter() - start) / len(QUERIES)
+
+    full_chars = len(render_product_info(products))
+    topk_chars = sum(len(s) for s in selected) / len(selected)
+    print(
+        f"{size:>8} | {build_s * 1000:>10.1f} | {sync_s * 1000:>9.2f} | {query_s * 1000:>9.3f} | "
+        f"{full_chars // 4:>12} | {int(topk_chars) // 4:>10}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000, 50000])
+    parser.add_argument("--k", type=int, default=8)
+    args = parser.parse_args()
+
+    print(f"{'products':>8} | {'build ms':>10} | {'sync 1% ms':>9} | {'query ms':>9} | {'full tokens':>12} | {'top-k tokens':>10}")
+    for size in args.sizes:
+        run(size, args.k)
+
+
+if __name__ == "__main__":
+    main()
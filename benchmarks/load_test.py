@@ -0,0 +1,256 @@
+"""Offline load test for the HService /chat API.
+
+Runs the FastAPI app in-process against fake LLM providers with configurable
+latency, jitter and slow tail, and against the mock product repository or a generated
+catalog. Drives concurrent conversations and reports latency percentiles,
+throughput and a per-stage breakdown taken from the Server-Timing header.
+Results are saved as JSON so runs can be compared against a stored baseline;
+benchmarks/results/baseline.json is the committed reference for the default settings
+and other result files are git-ignored.
+
+Run from the repository root:
+
+    python -m benchmarks.load_test --conversations 50 --turns 4 --output benchmarks/results/baseline.json
+    python -m benchmarks.load_test --catalog-size 20000 --baseline benchmarks/results/baseline.json
+    python -m benchmarks.load_test --tail-probability 0.05 --providers 2 --hedge
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+from pathlib import Path
+
+import httpx
+
+from HService.service.observability import percentile
+
+# Mensaje del usuario y su intent, con el que se entrena el clasificador del ruteo por tier
+LABELED_MESSAGES = {
+    "Hola, ¿qué medios de pago aceptan?": "check_payment_methods",
+    "Busco una notebook con 16GB de RAM, ¿tienen alguna?": "place_order",
+    "¿Cuánto tarda el envío a Córdoba?": "delivery_period",
+    "Quiero cambiar la dirección de envío de mi pedido": "change_shipping_address",
+    "¿Tienen auriculares bluetooth con cancelación de ruido?": "place_order",
+    "Me cobraron dos veces la misma compra": "payment_issue",
+    "Gracias, eso es todo": "review",
+}
+USER_MESSAGES = list(LABELED_MESSAGES)
+
+
+async def configure_service(args):
+    from HService.service import product_service
+    from database.mock_product_repository import get_all_mock_products
+
+    if args.catalog_size:
+        from benchmarks.bench_product_index import generate_catalog
+        catalog = generate_catalog(args.catalog_size)
+        products = lambda: catalog
+    else:
+        products = get_all_mock_products
+
+    def loader():
+        # Simula el round trip a MySQL además de construir la lista
+        time.sleep(args.db_latency)
+        return products()
+
+    product_service.catalog_cache.loader = loader
+    product_service.catalog_cache.ttl = args.catalog_ttl
+    product_service.invalidate_catalog()
+
+    import HService.api_dialogue as api
+    from HService.domain.llm_providers import FakeProvider
+    from HService.domain.llm_router import LLMRouter
+    providers = [
+        FakeProvider(
+            f"fake{i}", args.llm_latency, args.llm_jitter,
+            tail_probability=args.tail_probability, tail_latency=args.tail_latency, seed=args.seed + i,
+        )
+        for i in range(args.providers)
+    ]
+    def write_transcripts(rows):
+        # Simula el INSERT por lotes; corre fuera del loop y no debería notarse en la latencia del chat
+        time.sleep(args.transcript_write_latency)
+
+    fast_llm = None
+    if args.fast_llm_latency:
+        fast_llm = LLMRouter([FakeProvider(
+            "fast", args.fast_llm_latency, args.fast_llm_latency / 4,
+            invalid_probability=args.fast_invalid_probability, seed=args.seed + 100,
+        )])
+
+    # ASGITransport no ejecuta el lifespan: el arranque se hace acá, con el mismo warm-up que en producción
+    api.transcript_writer.write = write_transcripts
+    api.transcript_writer.start()
+    await api.service.start(llm=LLMRouter(providers, hedge=args.hedge), fast_llm=fast_llm)
+    if not api.service.ready:
+        raise SystemExit(f"Service failed to start: {api.service.error}")
+    if fast_llm is not None:
+        # El ruteo por tier necesita el intent del clasificador local; las respuestas fijas quedan apagadas
+        from HService.domain.fast_path import FastPathResponder
+        from HService.domain.intent_classifier import IntentClassifier
+        from HService.domain.models import Intent
+        classifier = IntentClassifier.train(
+            list(LABELED_MESSAGES) * 20, [Intent(v) for v in LABELED_MESSAGES.values()] * 20, seed=args.seed,
+        )
+        api.service.dialogue_manager.fast_path = FastPathResponder(classifier, threshold=float("inf"))
+    if not args.response_cache:
+        api.service.dialogue_manager.response_cache.enabled = False
+    return api, api.service.status()["startup_ms"]
+
+
+async def run_conversation(client: httpx.AsyncClient, args, rng: random.Random, samples: list, errors: list):
+    history = [{"sender": "assistant", "msg": "A new support ticket has been opened. How can I assist you today?"}]
+    session_id = None
+    if args.mode == "sessions":
+        response = await client.post("/sessions", json={"chat_history": history})
+        session_id = response.json()["session_id"]
+
+    for _ in range(args.turns):
+        message = rng.choice(USER_MESSAGES)
+        history.append({"sender": "user", "msg": message})
+
+        start = time.perf_counter()
+        if args.mode == "sessions":
+            response = await client.post(f"/sessions/{session_id}/messages", json={"msg": message})
+        else:
+            response = await client.post("/chat", json={"chat_history": history})
+        elapsed = time.perf_counter() - start
+
+        if response.status_code != 200:
+            errors.append(response.status_code)
+            continue
+        history.append({"sender": "assistant", "msg": response.json()["response"]})
+        times = parse_server_timing(response.headers.get("Server-Timing", ""))
+        times["total"] = elapsed
+        samples.append(times)
+
+    if session_id is not None:
+        # Terminar la sesión encola su transcript
+        await client.delete(f"/sessions/{session_id}")
+
+
+def parse_server_timing(header: str) -> dict:
+    # "catalog;dur=0.52, llm;dur=801.3" -> {"catalog": 0.00052, "llm": 0.8013} (en segundos)
+    times = {}
+    for entry in header.split(","):
+        name, _, params = entry.strip().partition(";")
+        if name and name != "total" and params.startswith("dur="):
+            times[name] = float(params[len("dur="):]) / 1000
+    return times
+
+
+def summarize(samples: list[dict], errors: list, wall: float, args, startup_ms: dict) -> dict:
+    totals = [s["total"] for s in samples]
+    stages = {}
+    names = sorted({name for s in samples for name in s if name != "total"})
+    for stage in names:
+        values = [s.get(stage, 0.0) for s in samples]
+        stages[stage] = {"mean_ms": statistics.fmean(values) * 1000 if values else 0.0, "p95_ms": percentile(values, 95) * 1000}
+    other = [s["total"] - sum(v for k, v in s.items() if k != "total") for s in samples]
+    stages["unaccounted"] = {"mean_ms": statistics.fmean(other) * 1000 if other else 0.0, "p95_ms": percentile(other, 95) * 1000}
+
+    return {
+        "config": {k: v for k, v in vars(args).items() if k not in ("output", "baseline")},
+        "requests": len(samples),
+        "errors": len(errors),
+        "errors_by_status": {str(code): errors.count(code) for code in sorted(set(errors))},
+        "wall_seconds": wall,
+        "rps": len(samples) / wall if wall else 0.0,
+        "latency_ms": {
+            "p50": percentile(totals, 50) * 1000,
+            "p95": percentile(totals, 95) * 1000,
+            "p99": percentile(totals, 99) * 1000,
+            "mean": statistics.fmean(totals) * 1000 if totals else 0.0,
+        },
+        "stages": stages,
+        "startup_ms": startup_ms,
+    }
+
+
+def print_report(result: dict, baseline: dict | None):
+    def line(label: str, value: float, base: float | None, unit: str):
+        delta = ""
+        if base:
+            delta = f"  ({(value - base) / base * 100:+.1f}% vs baseline)"
+        print(f"  {label:<22}{value:>10.1f} {unit}{delta}")
+
+    print(f"requests={result['requests']} errors={result['errors']} {result['errors_by_status']} wall={result['wall_seconds']:.2f}s")
+    startup = result.get("startup_ms", {})
+    print("  startup " + ", ".join(f"{k}={v:.0f}ms" for k, v in startup.items()))
+    line("throughput", result["rps"], baseline and baseline["rps"], "req/s")
+    for key in ("p50", "p95", "p99", "mean"):
+        line(f"latency {key}", result["latency_ms"][key], baseline and baseline["latency_ms"][key], "ms")
+    for stage, values in result["stages"].items():
+        base = baseline and baseline["stages"].get(stage, {}).get("mean_ms")
+        line(f"{stage} mean", values["mean_ms"], base, "ms")
+
+
+async def main_async(args):
+    samples, errors = [], []
+    rng = random.Random(args.seed)
+
+    api = None
+    if args.url:
+        # El servidor remoto ya arrancó con su propia configuración: no se levanta nada en este proceso
+        client = httpx.AsyncClient(base_url=args.url, timeout=60)
+    else:
+        api, startup_ms = await configure_service(args)
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=api.app), base_url="http://bench", timeout=60)
+
+    async with client:
+        if api is None:
+            startup_ms = (await client.get("/readyz")).json().get("startup_ms", {})
+        semaphore = asyncio.Semaphore(args.concurrency)
+
+        async def bounded(i: int):
+            async with semaphore:
+                await run_conversation(client, args, random.Random(rng.random() + i), samples, errors)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(bounded(i) for i in range(args.conversations)))
+        wall = time.perf_counter() - start
+
+    if api is not None:
+        await api.transcript_writer.close()
+    return summarize(samples, errors, wall, args, startup_ms)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--conversations", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--turns", type=int, default=4)
+    parser.add_argument("--mode", choices=["chat", "sessions"], default="chat")
+    parser.add_argument("--llm-latency", type=float, default=0.8, help="mean fake LLM latency in seconds")
+    parser.add_argument("--llm-jitter", type=float, default=0.2)
+    parser.add_argument("--tail-probability", type=float, default=0.0, help="share of fake LLM calls that hit the slow tail")
+    parser.add_argument("--tail-latency", type=float, default=5.0)
+    parser.add_argument("--providers", type=int, default=1, help="number of fake LLM providers behind the router")
+    parser.add_argument("--hedge", action="store_true", help="hedge slow LLM calls on the next provider")
+    parser.add_argument("--fast-llm-latency", type=float, default=0.0, help="add a fast model tier with this mean latency (0 = pro tier only)")
+    parser.add_argument("--fast-invalid-probability", type=float, default=0.0, help="share of fast-tier answers that fail validation")
+    parser.add_argument("--db-latency", type=float, default=0.005, help="simulated catalog query latency in seconds")
+    parser.add_argument("--transcript-write-latency", type=float, default=0.05, help="simulated transcript batch insert latency in seconds")
+    parser.add_argument("--catalog-size", type=int, default=0, help="generated catalog size (0 = mock repository)")
+    parser.add_argument("--catalog-ttl", type=float, default=300)
+    parser.add_argument("--response-cache", action="store_true", help="keep the response cache enabled")
+    parser.add_argument("--url", help="drive a running server instead of the in-process app")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="benchmarks/results/latest.json")
+    parser.add_argument("--baseline")
+    args = parser.parse_args()
+
+    result = asyncio.run(main_async(args))
+    baseline = json.loads(Path(args.baseline).read_text()) if args.baseline else None
+    print_report(result, baseline)
+
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(result, indent=2))
+    print(f"Results saved to {output}")
+
+
+if __name__ == "__main__":
+    main()
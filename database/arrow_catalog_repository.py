@@ -0,0 +1,127 @@
+import glob
+import hashlib
+import os
+from typing import Iterable
+
+import pyarrow as pa
+
+from database.mysql_product_repository import _row_to_product
+from HService.domain.models import Product
+
+# Directorio compartido por los workers; vacío = cada worker lee productos de MySQL
+CATALOG_SNAPSHOT_DIR = os.getenv("CATALOG_SNAPSHOT_DIR", "")
+# Versiones anteriores que se conservan: un worker puede seguir leyendo una mientras cambia CURRENT
+CATALOG_SNAPSHOT_KEEP = int(os.getenv("CATALOG_SNAPSHOT_KEEP", "3"))
+
+# Mismas columnas y orden que PRODUCT_COLUMNS, así cada fila se convierte con _row_to_product
+CATALOG_SCHEMA = pa.schema([
+    ("id", pa.int64()),
+    ("name", pa.string()),
+    ("description", pa.string()),
+    ("price", pa.float64()),
+    ("in_stock", pa.bool_()),
+    ("discount_percent", pa.float64()),
+])
+# Archivo con el nombre del snapshot vigente; se reemplaza con os.replace, que es atómico
+CURRENT_FILE = "CURRENT"
+
+
+def products_to_table(products: Iterable[Product]) -> pa.Table:
+    products = list(products)
+    columns = {name: [getattr(p, name) for p in products] for name in CATALOG_SCHEMA.names}
+    return pa.Table.from_pydict(columns, schema=CATALOG_SCHEMA)
+
+def table_to_products(table: pa.Table) -> list[Product]:
+    # Columna por columna: to_pylist por columna es mucho más rápido que table.to_pylist por fila
+    columns = [table.column(name).to_pylist() for name in CATALOG_SCHEMA.names]
+    return [_row_to_product(row) for row in zip(*columns)]
+
+def _write_atomic(path: str, data: bytes):
+    tmp = f"{path}.tmp-{os.getpid()}"
+    with open(tmp, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def current_snapshot_version(directory: str = CATALOG_SNAPSHOT_DIR) -> str | None:
+    try:
+        with open(os.path.join(directory, CURRENT_FILE), encoding="utf-8") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+def write_catalog_snapshot(
+    products: Iterable[Product], directory: str = CATALOG_SNAPSHOT_DIR, keep: int = CATALOG_SNAPSHOT_KEEP,
+) -> tuple[str, bool]:
+    """Exporta el catálogo como archivo Arrow IPC (Feather v2) sin comprimir y lo publica en CURRENT.
+
+    Sin compresión para que los workers lo puedan mapear en memoria sin copiarlo. La versión es
+    un hash del contenido: si el catálogo no cambió no se publica nada y los workers no recargan.
+    Devuelve la versión y si es nueva.
+    """
+    table = products_to_table(products)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    data = sink.getvalue().to_pybytes()
+    version = hashlib.sha256(data).hexdigest()[:16]
+
+    os.makedirs(directory, exist_ok=True)
+    if current_snapshot_version(directory) == version:
+        return version, False
+    # Primero el archivo completo y después el puntero: un worker nunca ve un snapshot a medio escribir
+    _write_atomic(os.path.join(directory, f"catalog-{version}.arrow"), data)
+    _write_atomic(os.path.join(directory, CURRENT_FILE), version.encode())
+    _prune_snapshots(directory, version, keep)
+    return version, True
+
+def _prune_snapshots(directory: str, current: str, keep: int):
+    # Borrar un archivo que otro worker tiene mapeado es seguro: el mapeo sigue válido hasta que lo suelta
+    paths = sorted(glob.glob(os.path.join(directory, "catalog-*.arrow")), key=os.path.getmtime, reverse=True)
+    old = [p for p in paths if os.path.basename(p) != f"catalog-{current}.arrow"]
+    for path in old[max(keep - 1, 0):]:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def read_catalog_snapshot(directory: str = CATALOG_SNAPSHOT_DIR, version: str | None = None) -> tuple[str, pa.Table]:
+    # memory_map + read_all no copia los datos: las columnas apuntan a las páginas del archivo,
+    # que el page cache del sistema comparte entre todos los workers
+    version = version or current_snapshot_version(directory)
+    if version is None:
+        raise FileNotFoundError(f"No catalog snapshot in {directory!r}; run scripts.export_catalog_snapshot first")
+    with pa.memory_map(os.path.join(directory, f"catalog-{version}.arrow")) as source:
+        table = pa.ipc.open_file(source).read_all()
+    if not table.schema.equals(CATALOG_SCHEMA):
+        raise ValueError(f"Catalog snapshot {version} has an unexpected schema: {table.schema}")
+    return version, table
+
+
+# ---------------- Snapshot Source ----------------
+class ArrowCatalogSource:
+    """Loader de ProductCatalogCache que lee el snapshot Arrow publicado en directory.
+
+    Cada llamada solo lee CURRENT; si la versión no cambió devuelve la misma tabla y la caché
+    no recalcula nada. Si cambió, mapea el archivo nuevo y lo devuelve: el cambio de versión
+    es atómico porque la caché reemplaza el snapshot entero de una vez.
+    """
+
+    def __init__(self, directory: str = CATALOG_SNAPSHOT_DIR):
+        self.directory = directory
+        self.version: str | None = None
+        self.table: pa.Table | None = None
+
+    def __call__(self) -> pa.Table:
+        version = current_snapshot_version(self.directory)
+        if self.table is not None and version == self.version:
+            return self.table
+        try:
+            self.version, self.table = read_catalog_snapshot(self.directory, version)
+        except FileNotFoundError:
+            # CURRENT cambió y la versión que leímos ya se borró: se vuelve a leer el puntero
+            self.version, self.table = read_catalog_snapshot(self.directory)
+        return self.table
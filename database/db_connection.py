@@ -1,9 +1,154 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
 import mysql.connector
 
+DB_CONFIG = {
+    "host": "127.0.0.1",
+    "user": "root",
+    "password": "",         # ← Vacía si no usás contraseña
+    "database": "tienda",
+}
+
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+POOL_CHECKOUT_TIMEOUT = float(os.getenv("DB_POOL_CHECKOUT_TIMEOUT", "5"))
+# Conexiones ociosas por más de este tiempo se verifican con un ping antes de usarse
+POOL_HEALTH_CHECK_INTERVAL = float(os.getenv("DB_POOL_HEALTH_CHECK_INTERVAL", "30"))
+
+
+# Errores de la conexión en sí: después de estos la conexión no se puede reutilizar.
+# IntegrityError, ProgrammingError, etc. son errores de la consulta y la conexión sigue sana
+CONNECTION_ERRORS = (mysql.connector.InterfaceError, mysql.connector.OperationalError)
+
+
+class PoolTimeoutError(Exception):
+    pass
+
+
 def get_db_connection():
-    return mysql.connector.connect(
-        host="127.0.0.1",
-        user="root",
-        password="",         # ← Vacía si no usás contraseña
-        database="tienda"
-    )
+    return mysql.connector.connect(**DB_CONFIG)
+
+
+# ---------------- Connection Pool ----------------
+class ConnectionPool:
+    def __init__(
+        self,
+        size: int = POOL_SIZE,
+        checkout_timeout: float = POOL_CHECKOUT_TIMEOUT,
+        health_check_interval: float = POOL_HEALTH_CHECK_INTERVAL,
+        connect=get_db_connection,
+    ):
+        if size < 1:
+            raise ValueError("Pool size must be at least 1")
+        self.size = size
+        self.checkout_timeout = checkout_timeout
+        self.health_check_interval = health_check_interval
+        self._connect = connect
+        # LIFO: reusamos la conexión más reciente, que es la que menos probablemente expiró
+        self._idle: list[tuple[object, float]] = []
+        self._created = 0
+        # Se notifica cuando vuelve una conexión o se libera un lugar para abrir una nueva
+        self._available = threading.Condition()
+
+    def acquire(self, timeout: float | None = None):
+        timeout = self.checkout_timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        while True:
+            conn, last_used = self._checkout(deadline, timeout)
+            if conn is None:
+                return self._create()
+            if time.monotonic() - last_used <= self.health_check_interval or self._is_healthy(conn):
+                return conn
+            # Conexión caída: se descarta y se vuelve a intentar con el lugar que quedó libre
+            self._discard(conn)
+
+    def _checkout(self, deadline: float, timeout: float):
+        # Devuelve una conexión ociosa, o (None, 0) si hay lugar para abrir una nueva
+        with self._available:
+            while True:
+                if self._idle:
+                    return self._idle.pop()
+                if self._created < self.size:
+                    self._created += 1
+                    return None, 0.0
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PoolTimeoutError(f"No database connection available after {timeout}s")
+                self._available.wait(remaining)
+
+    def release(self, conn):
+        try:
+            # Cerramos cualquier transacción abierta para no leer snapshots viejos en el próximo uso
+            conn.rollback()
+        except Exception:
+            self._discard(conn)
+            return
+        with self._available:
+            self._idle.append((conn, time.monotonic()))
+            self._available.notify()
+
+    @contextmanager
+    def connection(self, timeout: float | None = None):
+        conn = self.acquire(timeout)
+        try:
+            yield conn
+        except CONNECTION_ERRORS:
+            self._discard(conn)
+            raise
+        except BaseException:
+            self.release(conn)
+            raise
+        else:
+            self.release(conn)
+
+    def close(self):
+        with self._available:
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            self._discard(conn)
+
+    def _create(self):
+        # El lugar ya se reservó en _checkout; se conecta fuera del lock
+        try:
+            return self._connect()
+        except Exception:
+            self._free_slot()
+            raise
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+        self._free_slot()
+
+    def _free_slot(self):
+        with self._available:
+            self._created -= 1
+            self._available.notify()
+
+    def _is_healthy(self, conn) -> bool:
+        try:
+            conn.ping(reconnect=False)
+            return True
+        except Exception:
+            return False
+
+
+_pool: ConnectionPool | None = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool()
+    return _pool
+
+
+def pooled_connection(timeout: float | None = None):
+    return get_pool().connection(timeout)
@@ -1,27 +1,79 @@
-from database.db_connection import get_db_connection
+import os
+from typing import Iterator
+
+from database.db_connection import pooled_connection
 from HService.domain.models import Product
 
+# Solo las columnas que usa Product, en el orden en que las lee _row_to_product
+PRODUCT_COLUMNS = "id, name, description, price, in_stock, discount_percent"
+PRODUCT_PAGE_SIZE = int(os.getenv("PRODUCT_PAGE_SIZE", "1000"))
+# ngram_token_size del servidor MySQL con el que se creó ft_productos_name
+DB_NGRAM_TOKEN_SIZE = int(os.getenv("DB_NGRAM_TOKEN_SIZE", "2"))
 
-def fetch_all_products() -> list[Product]:
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
 
-    cursor.execute("SELECT * FROM productos")
-    rows = cursor.fetchall()
+def _row_to_product(row: tuple) -> Product:
+    # Filas de nuestra propia tabla: convertimos los tipos de MySQL (DECIMAL, TINYINT) y armamos el modelo sin validar
+    id, name, description, price, in_stock, discount_percent = row
+    return Product.model_construct(
+        id=int(id),
+        name=name,
+        description=description or "",
+        price=float(price),
+        in_stock=bool(in_stock),
+        discount_percent=float(discount_percent or 0),
+    )
 
-    cursor.close()
-    conn.close()
+def _escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
 
-    return [Product(**row) for row in rows]
 
-def fetch_product_by_name(name: str) -> Product | None:
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
+def fetch_products_page(after_id: int = 0, limit: int = PRODUCT_PAGE_SIZE) -> list[Product]:
+    # Paginación por clave: usa el índice primario y no se degrada con el offset como LIMIT/OFFSET
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            f"SELECT {PRODUCT_COLUMNS} FROM productos WHERE id > %s ORDER BY id LIMIT %s",
+            (after_id, limit),
+        )
+        rows = cursor.fetchall()
+        cursor.close()
 
-    cursor.execute("SELECT * FROM productos WHERE name = %s", (name,))
-    row = cursor.fetchone()
+    return [_row_to_product(row) for row in rows]
 
-    cursor.close()
-    conn.close()
+def iter_products(page_size: int = PRODUCT_PAGE_SIZE) -> Iterator[Product]:
+    # Cada página usa su propia conexión del pool: no se retiene una conexión mientras el llamador procesa
+    after_id = 0
+    while True:
+        page = fetch_products_page(after_id, page_size)
+        yield from page
+        if len(page) < page_size:
+            return
+        after_id = page[-1].id
 
-    return Product(**row) if row else None
\ No newline at end of file
+def fetch_all_products() -> list[Product]:
+    return list(iter_products())
+
+def fetch_product_by_name(name: str) -> Product | None:
+    # Mismo criterio que get_mock_product_by_name: subcadena sin distinguir mayúsculas (collation _ci).
+    # Primero exacto y por prefijo con idx_productos_name; la subcadena usa el índice FULLTEXT ngram
+    # ft_productos_name (un '%x%' recorrería la tabla entera) y LOCATE descarta falsos positivos
+    pattern = _escape_like(name)
+    queries = [
+        ("name = %s", (name,)),
+        ("name LIKE %s ESCAPE '\\\\'", (f"{pattern}%",)),
+    ]
+    phrase = name.replace('"', " ").strip()
+    if len(phrase) >= DB_NGRAM_TOKEN_SIZE:
+        # Más cortas que un ngram no están en el índice
+        queries.append(("MATCH(name) AGAINST (%s IN BOOLEAN MODE) AND LOCATE(%s, name) > 0", (f'"{phrase}"', name)))
+    with pooled_connection() as conn:
+        cursor = conn.cursor(buffered=True)
+        try:
+            for condition, params in queries:
+                cursor.execute(f"SELECT {PRODUCT_COLUMNS} FROM productos WHERE {condition} ORDER BY id LIMIT 1", params)
+                row = cursor.fetchone()
+                if row:
+                    return _row_to_product(row)
+            return None
+        finally:
+            cursor.close()
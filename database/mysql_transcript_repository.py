@@ -0,0 +1,18 @@
+from database.db_connection import pooled_connection
+
+TRANSCRIPT_COLUMNS = "session_id, intent, is_ticket_closed, close_reason, message_count, messages, closed_at"
+
+
+def insert_transcripts(rows: list[tuple]):
+    # Un solo INSERT con todas las filas del lote (executemany lo reescribe como INSERT ... VALUES (...), (...))
+    # y un único commit
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.executemany(
+                f"INSERT INTO chat_transcripts ({TRANSCRIPT_COLUMNS}) VALUES (%s, %s, %s, %s, %s, %s, %s)",
+                rows,
+            )
+            conn.commit()
+        finally:
+            cursor.close()
@@ -0,0 +1,19 @@
+-- Transcripts de conversaciones terminadas, escritos por HService/service/transcript_service.py.
+-- Una fila por cierre: cuando el LLM marca el ticket como cerrado, cuando el cliente termina la sesión
+-- o cuando la sesión expira o se desaloja sin que nadie la cierre. Cada fila lleva solo los mensajes
+-- posteriores a la fila anterior de la misma sesión; una sesión retomada con el historial de otra
+-- que expiró no repite esos mensajes.
+-- Los índices van dentro del CREATE TABLE: correr la migración de nuevo no falla.
+CREATE TABLE IF NOT EXISTS chat_transcripts (
+    id BIGINT UNSIGNED NOT NULL AUTO_INCREMENT PRIMARY KEY,
+    session_id VARCHAR(64) NULL,
+    intent VARCHAR(64) NULL,
+    is_ticket_closed TINYINT(1) NOT NULL,
+    close_reason VARCHAR(32) NOT NULL,
+    message_count INT NOT NULL,
+    messages JSON NOT NULL,
+    closed_at DATETIME(3) NOT NULL,
+    -- Consultas de analytics por período y por intent
+    INDEX idx_chat_transcripts_closed_at (closed_at),
+    INDEX idx_chat_transcripts_intent (intent, closed_at)
+);
@@ -0,0 +1,30 @@
+-- Índices para las consultas de database/mysql_product_repository.py.
+-- La búsqueda por nombre no distingue mayúsculas gracias a la collation _ci de la columna
+-- (utf8mb4_0900_ai_ci es la de defecto en MySQL 8); si la tabla usa otra, conviene cambiarla:
+--   ALTER TABLE productos MODIFY name VARCHAR(255) NOT NULL COLLATE utf8mb4_0900_ai_ci;
+-- MySQL no tiene CREATE INDEX IF NOT EXISTS: cada índice se crea solo si no está en
+-- information_schema, así correr la migración de nuevo no falla.
+
+-- Búsqueda exacta y por prefijo (name = ? / name LIKE 'x%')
+SET @ddl = IF(
+    (SELECT COUNT(*) FROM information_schema.statistics
+     WHERE table_schema = DATABASE() AND table_name = 'productos' AND index_name = 'idx_productos_name') = 0,
+    'CREATE INDEX idx_productos_name ON productos (name)',
+    'DO 0'
+);
+PREPARE stmt FROM @ddl;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+-- Búsqueda por subcadena (MATCH(name) AGAINST ('"x"' IN BOOLEAN MODE)) con el parser ngram.
+-- Sin stopwords: el parser ngram descarta todo ngram que contenga una, p. ej. cualquiera con "a"
+SET SESSION innodb_ft_enable_stopword = OFF;
+SET @ddl = IF(
+    (SELECT COUNT(*) FROM information_schema.statistics
+     WHERE table_schema = DATABASE() AND table_name = 'productos' AND index_name = 'ft_productos_name') = 0,
+    'CREATE FULLTEXT INDEX ft_productos_name ON productos (name) WITH PARSER ngram',
+    'DO 0'
+);
+PREPARE stmt FROM @ddl;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
@@ -0,0 +1,55 @@
+"""Export the product catalog as a versioned Arrow snapshot shared by the API workers.
+
+Run from the repository root, e.g. from cron or after a catalog import:
+
+    python -m scripts.export_catalog_snapshot --output /var/lib/hservice/catalog
+    python -m scripts.export_catalog_snapshot --output /var/lib/hservice/catalog --interval 60
+
+Start the workers with CATALOG_SNAPSHOT_DIR pointing at the same directory. Each worker
+memory-maps the current snapshot instead of querying `productos`, and switches to a new
+version within CATALOG_SNAPSHOT_POLL_SECONDS of it being published. The snapshot is only
+rewritten when the catalog changed.
+"""
+import argparse
+import time
+
+from database.arrow_catalog_repository import CATALOG_SNAPSHOT_DIR, CATALOG_SNAPSHOT_KEEP, write_catalog_snapshot
+
+
+def load_products(args):
+    if args.mock:
+        from database.mock_product_repository import get_all_mock_products
+        return get_all_mock_products()
+    from database.mysql_product_repository import iter_products
+    return iter_products()
+
+
+def export(args):
+    start = time.perf_counter()
+    version, published = write_catalog_snapshot(load_products(args), args.output, keep=args.keep)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    state = "published" if published else "unchanged"
+    print(f"Catalog snapshot {version} {state} in {args.output} ({elapsed_ms:.0f} ms)", flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--output", default=CATALOG_SNAPSHOT_DIR or None, required=not CATALOG_SNAPSHOT_DIR,
+                        help="snapshot directory (defaults to CATALOG_SNAPSHOT_DIR)")
+    parser.add_argument("--keep", type=int, default=CATALOG_SNAPSHOT_KEEP, help="snapshot versions kept on disk")
+    parser.add_argument("--interval", type=float, default=0, help="re-export every this many seconds (0 = once)")
+    parser.add_argument("--mock", action="store_true", help="export the mock catalog instead of MySQL")
+    args = parser.parse_args()
+
+    export(args)
+    while args.interval:
+        time.sleep(args.interval)
+        try:
+            export(args)
+        except Exception as e:
+            # Los workers siguen con el último snapshot publicado; se reintenta en el próximo intervalo
+            print(f"Catalog export failed: {type(e).__name__}: {e}", flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""Replay transcripts through DialogueManager and report intent accuracy, throughput and cost.
+
+Run from the repository root:
+
+    python -m scripts.replay_transcripts --limit 2000 --concurrency 16
+    python -m scripts.replay_transcripts --transcripts transcripts.jsonl --checkpoint runs/prompt-v2.jsonl
+    python -m scripts.replay_transcripts --limit 500 --url http://localhost:8000
+
+By default it replays single-turn transcripts built from the Bitext customer-support
+dataset (the same source as scripts.train_intent_classifier). A --transcripts file has
+one JSON object per line: {"id": ..., "chat_history": [{"sender": ..., "msg": ...}], "expected_intent": ...}.
+
+Every result is appended to the checkpoint as soon as it is available; running the same
+command again skips the transcripts already answered, so an interrupted run resumes where
+it stopped. The report is written next to the checkpoint as JSON.
+"""
+import argparse
+import asyncio
+import json
+import time
+from pathlib import Path
+
+import numpy as np
+
+from HService.domain.models import Intent, Message
+from HService.service.batch_service import BatchCheckpoint, BatchItem, BatchResult, BatchRunner, summarize_results
+from scripts.train_intent_classifier import BITEXT_DATASET, load_examples
+
+GREETING = "A new support ticket has been opened. How can I assist you today?"
+
+
+def load_items(args) -> list[BatchItem]:
+    if args.transcripts:
+        items = []
+        with open(args.transcripts, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                row = json.loads(line)
+                items.append(BatchItem(
+                    id=str(row["id"]),
+                    chat_history=[Message(role=m["sender"], content=m["msg"]) for m in row["chat_history"]],
+                    expected_intent=Intent(row["expected_intent"]) if row.get("expected_intent") else None,
+                ))
+    else:
+        texts, labels = load_examples(args)
+        items = [
+            BatchItem(
+                id=f"row-{i}",
+                chat_history=[Message(role="assistant", content=GREETING), Message(role="user", content=text)],
+                expected_intent=label,
+            )
+            for i, (text, label) in enumerate(zip(texts, labels))
+        ]
+
+    # Muestra determinística: con la misma semilla, retomar procesa los mismos ids
+    if args.limit and args.limit < len(items):
+        order = np.random.default_rng(args.seed).permutation(len(items))[:args.limit]
+        items = [items[i] for i in sorted(order)]
+    return items
+
+
+def configure_dialogue_manager(args):
+    from HService.domain.dialogue_manager import DialogueManager
+    from HService.domain.fast_path import FastPathResponder
+
+    llm = None
+    if args.fake_llm is not None:
+        from HService.domain.llm_providers import FakeProvider
+        from HService.domain.llm_router import LLMRouter
+        from database.mock_product_repository import get_all_mock_products
+        from HService.service import product_service
+        product_service.catalog_cache.loader = get_all_mock_products
+        llm = LLMRouter([FakeProvider("fake", args.fake_llm, args.fake_llm / 4, seed=args.seed)])
+
+    dialogue_manager = DialogueManager(llm)
+    if not args.response_cache:
+        # Evaluar un cambio de prompt o de modelo exige respuestas nuevas, no las cacheadas
+        dialogue_manager.response_cache.enabled = False
+    if args.no_fast_path:
+        dialogue_manager.fast_path = FastPathResponder(None)
+    return dialogue_manager
+
+
+async def replay_in_process(args, items: list[BatchItem], checkpoint: BatchCheckpoint):
+    runner = BatchRunner(configure_dialogue_manager(args), concurrency=args.concurrency, checkpoint=checkpoint)
+    return await runner.run(items, on_result=progress_printer(len(items)))
+
+
+async def replay_remote(args, items: list[BatchItem], checkpoint: BatchCheckpoint):
+    import httpx
+
+    ids = {item.id for item in items}
+    done = {id: r for id, r in checkpoint.load().items() if id in ids}
+    results = list(done.values())
+    pending = [item for item in items if item.id not in done]
+    on_result = progress_printer(len(items))
+    start = time.perf_counter()
+    try:
+        async with httpx.AsyncClient(base_url=args.url, timeout=None) as client:
+            for i in range(0, len(pending), args.chunk_size):
+                chunk = pending[i:i + args.chunk_size]
+                response = await client.post("/chat/batch", json={
+                    "concurrency": args.concurrency,
+                    "response_cache": args.response_cache,
+                    "items": [
+                        {
+                            "id": item.id,
+                            "chat_history": [{"sender": m.role, "msg": m.content} for m in item.chat_history],
+                            "expected_intent": item.expected_intent.value if item.expected_intent else None,
+                        }
+                        for item in chunk
+                    ],
+                })
+                response.raise_for_status()
+                for row in response.json()["results"]:
+                    row["bot_msg"] = row.pop("response")
+                    result = BatchResult(**row)
+                    results.append(result)
+                    checkpoint.write(result)
+                    on_result(result)
+    finally:
+        checkpoint.close()
+    return results, summarize_results(results, time.perf_counter() - start, len(results) - len(done))
+
+
+def progress_printer(total: int):
+    count = 0
+
+    def on_result(result: BatchResult):
+        nonlocal count
+        count += 1
+        if count % 100 == 0:
+            print(f"  {count} new results ({total} items in the run)", flush=True)
+    return on_result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--transcripts", help="JSONL file with transcripts to replay")
+    parser.add_argument("--dataset", default=BITEXT_DATASET)
+    parser.add_argument("--csv")
+    parser.add_argument("--text-column", default="instruction")
+    parser.add_argument("--intent-column", default="intent")
+    parser.add_argument("--limit", type=int, default=0, help="replay a random sample of this many transcripts")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--checkpoint", default="benchmarks/results/replay.jsonl")
+    parser.add_argument("--url", help="replay through a running server's /chat/batch instead of in-process")
+    parser.add_argument("--chunk-size", type=int, default=200, help="items per /chat/batch request with --url")
+    parser.add_argument("--response-cache", action="store_true", help="keep the response cache enabled")
+    parser.add_argument("--no-fast-path", action="store_true", help="send every transcript to the LLM")
+    parser.add_argument("--fake-llm", type=float, metavar="LATENCY", help="run offline with a fake LLM provider and the mock catalog")
+    args = parser.parse_args()
+
+    items = load_items(args)
+    checkpoint = BatchCheckpoint(args.checkpoint)
+    print(f"Replaying {len(items)} transcripts (checkpoint: {args.checkpoint})")
+    if args.url:
+        results, report = asyncio.run(replay_remote(args, items, checkpoint))
+    else:
+        results, report = asyncio.run(replay_in_process(args, items, checkpoint))
+
+    report_path = Path(args.checkpoint).with_suffix(".report.json")
+    report_path.write_text(json.dumps(report, indent=2, ensure_ascii=False))
+    print(json.dumps({k: v for k, v in report.items() if k != "per_intent_accuracy"}, indent=2))
+    print(f"Report saved to {report_path}")
+
+
+if __name__ == "__main__":
+    main()
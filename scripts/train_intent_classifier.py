@@ -0,0 +1,149 @@
+"""Train the local fast-path intent classifier and write an accuracy/latency report.
+
+Run from the repository root:
+
+    python -m scripts.train_intent_classifier
+    python -m scripts.train_intent_classifier --csv transcripts.csv --text-column text --intent-column intent
+
+By default it trains on the Bitext customer-support dataset, whose intents match
+HService.domain.models.Intent. The report is written next to the model as JSON.
+
+The report's "recommended_threshold" is the lowest confidence at which the held-out
+precision of the fast path (intents with a template in FAST_PATH_TEMPLATES_PATH, or
+every intent if none is configured) reaches --target-precision. The API uses it unless
+FAST_PATH_THRESHOLD is set; without a report the fast path never answers.
+"""
+import argparse
+import json
+import time
+from pathlib import Path
+
+import numpy as np
+
+from HService.domain.fast_path import FAST_PATH_TEMPLATES_PATH, intent_report_path, load_templates
+from HService.domain.intent_classifier import INTENT_MODEL_PATH, IntentClassifier
+from HService.domain.models import Intent
+
+BITEXT_DATASET = "bitext/Bitext-customer-support-llm-chatbot-training-dataset"
+
+
+def load_examples(args) -> tuple[list[str], list[Intent]]:
+    if args.csv:
+        import pandas as pd
+        frame = pd.read_csv(args.csv)
+    else:
+        from datasets import load_dataset
+        frame = load_dataset(args.dataset, split="train").to_pandas()
+
+    valid = {intent.value for intent in Intent}
+    frame = frame[frame[args.intent_column].isin(valid)]
+    return frame[args.text_column].astype(str).tolist(), [Intent(v) for v in frame[args.intent_column]]
+
+
+def recommend_threshold(confidences: np.ndarray, correct: np.ndarray, target_precision: float) -> float | None:
+    # Umbral más bajo cuya precisión sobre los ejemplos que lo superan alcanza el objetivo
+    order = np.argsort(-confidences)
+    precision = np.cumsum(correct[order]) / np.arange(1, len(order) + 1)
+    reached = np.flatnonzero(precision >= target_precision)
+    if not len(reached):
+        return None
+    # Con empates de confianza el umbral debe incluirlos a todos: se toma el último índice válido
+    # cuyo siguiente ejemplo tenga menor confianza
+    for k in reached[::-1]:
+        if k + 1 == len(order) or confidences[order[k + 1]] < confidences[order[k]]:
+            return float(confidences[order[k]])
+    return None
+
+
+def evaluate(
+    classifier: IntentClassifier, texts: list[str], labels: list[Intent],
+    templates: dict[Intent, str], target_precision: float, threshold: float | None = None,
+) -> dict:
+    predictions, confidences, latencies = [], [], []
+    for text in texts:
+        start = time.perf_counter()
+        intent, confidence = classifier.predict(text)
+        latencies.append(time.perf_counter() - start)
+        predictions.append(intent)
+        confidences.append(confidence)
+
+    correct = np.array([p == y for p, y in zip(predictions, labels)])
+    confidences = np.array(confidences)
+    # El fast path solo responde intents con plantilla; sin plantillas se mide sobre todos
+    answerable = np.array([not templates or p in templates for p in predictions])
+    recommended = recommend_threshold(confidences[answerable], correct[answerable], target_precision)
+    if threshold is None:
+        threshold = recommended if recommended is not None else float("inf")
+    confident = confidences >= threshold
+    fast_path = confident & answerable
+    latencies_us = np.array(latencies) * 1e6
+
+    per_intent = {}
+    for intent in sorted(set(labels), key=lambda i: i.value):
+        mask = np.array([y == intent for y in labels])
+        per_intent[intent.value] = round(float(correct[mask].mean()), 4)
+
+    return {
+        "examples": len(texts),
+        "accuracy": round(float(correct.mean()), 4),
+        "target_precision": target_precision,
+        "recommended_threshold": recommended,
+        "threshold": threshold if np.isfinite(threshold) else None,
+        "template_intents": sorted(intent.value for intent in templates),
+        "coverage_at_threshold": round(float(confident.mean()), 4),
+        "accuracy_at_threshold": round(float(correct[confident].mean()), 4) if confident.any() else None,
+        "fast_path_rate": round(float(fast_path.mean()), 4),
+        "fast_path_precision": round(float(correct[fast_path].mean()), 4) if fast_path.any() else None,
+        "latency_us": {
+            "p50": round(float(np.percentile(latencies_us, 50)), 1),
+            "p95": round(float(np.percentile(latencies_us, 95)), 1),
+            "p99": round(float(np.percentile(latencies_us, 99)), 1),
+        },
+        "per_intent_accuracy": per_intent,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dataset", default=BITEXT_DATASET)
+    parser.add_argument("--csv")
+    parser.add_argument("--text-column", default="instruction")
+    parser.add_argument("--intent-column", default="intent")
+    parser.add_argument("--output", default=INTENT_MODEL_PATH)
+    parser.add_argument("--test-fraction", type=float, default=0.2)
+    parser.add_argument("--epochs", type=int, default=10)
+    parser.add_argument("--templates", default=FAST_PATH_TEMPLATES_PATH,
+                        help="JSON {intent: response} answered by the fast path (defaults to FAST_PATH_TEMPLATES_PATH)")
+    parser.add_argument("--target-precision", type=float, default=0.98)
+    parser.add_argument("--threshold", type=float, help="evaluate at this threshold instead of the recommended one")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    texts, labels = load_examples(args)
+    order = np.random.default_rng(args.seed).permutation(len(texts))
+    n_test = int(len(texts) * args.test_fraction)
+    test_ids, train_ids = order[:n_test], order[n_test:]
+
+    start = time.perf_counter()
+    classifier = IntentClassifier.train(
+        [texts[i] for i in train_ids], [labels[i] for i in train_ids], epochs=args.epochs, seed=args.seed
+    )
+    train_s = time.perf_counter() - start
+
+    report = evaluate(
+        classifier, [texts[i] for i in test_ids], [labels[i] for i in test_ids],
+        load_templates(args.templates), args.target_precision, args.threshold,
+    )
+    report["train_examples"] = len(train_ids)
+    report["train_seconds"] = round(train_s, 2)
+
+    classifier.save(args.output)
+    report_path = Path(intent_report_path(args.output))
+    report_path.write_text(json.dumps(report, indent=2, ensure_ascii=False))
+
+    print(json.dumps({k: v for k, v in report.items() if k != "per_intent_accuracy"}, indent=2))
+    print(f"Model saved to {args.output}, report saved to {report_path}")
+
+
+if __name__ == "__main__":
+    main()